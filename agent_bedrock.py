@@ -18,6 +18,8 @@
 # Env (examples):
 #   export AWS_REGION=us-east-1
 #   export MODEL_ID="anthropic.claude-3-sonnet-20240229-v1:0"
+#   export PLANNING_MODEL_ID="anthropic.claude-3-haiku-20240307-v1:0"
+#   export FINALIZE_MODEL_ID="anthropic.claude-3-sonnet-20240229-v1:0"
 #   export LEDGER_LOCAL_ENABLE=1
 #   export LEDGER_LOCAL_PATH="/tmp/ledger.jsonl"
 #   export LEDGER_S3_BUCKET="rentpilot-artifacts"
@@ -28,21 +30,87 @@
 #   export RP_PREFS_DEFAULT='{"max_distance_km": 12, "min_transit": 60, "target_rent_to_income": 0.30}'
 #   export RP_VERIFY_STRICT=1
 #   export RP_VERIFY_HINTS=1
+#   export RP_BEDROCK_STREAM=1
+#   export RP_LLM_CACHE=1
+#   export RP_LLM_CACHE_TTL=900
+#   export RP_SEM_CACHE=1
+#   export RP_SEM_THRESHOLD=0.92
+#   export RP_PLAN_CACHE=1
+#   export RP_PLAN_SYNTH=1
 # -----------------------------------------------------------------------------
 
+import hashlib
+import importlib
 import json
 import os
 import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, List, Optional, Tuple
 
-import boto3
-
-import policy
-from ledger import write_entry, write_step
+from providers import plan_cache, semantic_cache
+from utils.jsonio import dumps, dumps_with_raw
 
 # ----------------------------- Config & Clients -----------------------------
 AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
-BEDROCK = boto3.client("bedrock-runtime", region_name=AWS_REGION)
+_BEDROCK = None  # created on first Converse call (keeps boto3 off the import path)
+
+def _get_bedrock():
+    """Memoized bedrock-runtime client; boto3/botocore are imported on first use."""
+    global _BEDROCK
+    if _BEDROCK is None:
+        import boto3
+        from botocore.config import Config
+
+        # Explicit pool/keepalive so warm invocations reuse the TLS connection to Bedrock
+        cfg = Config(
+            max_pool_connections=int(os.getenv("BEDROCK_MAX_POOL", "32")),
+            tcp_keepalive=True,
+            connect_timeout=float(os.getenv("BEDROCK_CONNECT_TIMEOUT", "3")),
+            read_timeout=float(os.getenv("BEDROCK_READ_TIMEOUT", "30")),
+            retries={"max_attempts": int(os.getenv("BEDROCK_MAX_ATTEMPTS", "2")), "mode": "standard"},
+        )
+        _BEDROCK = boto3.client("bedrock-runtime", region_name=AWS_REGION, config=cfg)
+    return _BEDROCK
+
+def _lazy_import(name: str):
+    """Import a module on first use; later calls hit sys.modules."""
+    mod = sys.modules.get(name)
+    return mod if mod is not None else importlib.import_module(name)
+
+# Runs deterministic tools alongside the planning call (tools don't depend on the plan)
+_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rp-agent")
+
+# Ledger flushes happen off the response path; one worker keeps JSONL lines in order
+_LEDGER_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rp-ledger")
+_LEDGER_PENDING: List[Any] = []
+
+def _ledger_done(fut: Any) -> None:
+    # Finished flushes leave the pending list so callers that never drain don't grow it
+    try:
+        _LEDGER_PENDING.remove(fut)
+    except ValueError:
+        pass  # already popped by drain_ledger
+
+def drain_ledger(timeout: Optional[float] = None) -> None:
+    """
+    Wait for queued ledger flushes (call before a Lambda handler returns).
+    `timeout` bounds the whole drain, S3 puts included, not each wait.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while _LEDGER_PENDING:
+        try:
+            fut = _LEDGER_PENDING.pop(0)
+        except IndexError:
+            break  # the last one finished (and removed itself) meanwhile
+        try:
+            fut.result(timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+        except Exception as e:
+            print(f"[WARN] ledger flush incomplete: {e}")
+    led = sys.modules.get("ledger")
+    if led is not None:
+        led.flush(timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
 
 # Token caps to keep demos snappy and costs predictable
 _MAX_TOK_PLANNING = int(os.getenv("PLANNING_MAX_TOKENS", "700"))
@@ -75,6 +143,18 @@ except Exception:
 RP_VERIFY_STRICT = os.getenv("RP_VERIFY_STRICT", "1") == "1"
 RP_VERIFY_HINTS  = os.getenv("RP_VERIFY_HINTS",  "1") == "1"
 
+# Stream Converse output (tokens accumulate as they decode); set 0 to use blocking converse
+RP_BEDROCK_STREAM = os.getenv("RP_BEDROCK_STREAM", "1") == "1"
+
+# Skip the planning LLM call when the tool choice is unambiguous from the args
+RP_PLAN_SYNTH = os.getenv("RP_PLAN_SYNTH", "1") == "1"
+
+# Exact-key LLM response cache (process-local; survives warm Lambda invocations); opt-in
+RP_LLM_CACHE     = os.getenv("RP_LLM_CACHE", "0") == "1"
+_LLM_CACHE_TTL   = float(os.getenv("RP_LLM_CACHE_TTL", "900"))
+_LLM_CACHE_MAX   = int(os.getenv("RP_LLM_CACHE_MAX", "512"))
+_LLM_CACHE: Dict[str, Tuple[float, str]] = {}  # key -> (monotonic ts, raw text)
+
 # ----------------------------- Arg parsing & tiny NLU -----------------------------
 _CITIES = [
     "Toronto","Montreal","Vancouver","Ottawa","Calgary","Edmonton",
@@ -87,6 +167,42 @@ _PROP_MAP = {
     r"\b(3[\s-]*bed|three[\s-]*bed(room)?)\b": "3bed",
 }
 
+# Compiled once at import; the request path only runs .search/.sub/.finditer
+_CITY_LUT = {c.lower(): c for c in _CITIES}
+_CITY_PRIORITY = {c: i for i, c in enumerate(_CITIES)}  # several cities named: _CITIES order wins
+_CITY_RE = re.compile(
+    r"\b(" + "|".join(re.escape(c) for c in sorted(_CITY_LUT, key=len, reverse=True)) + r")\b",
+    re.IGNORECASE,
+)
+_PROP_NORMS = tuple(_PROP_MAP.values())
+_PROP_RE = re.compile(
+    "|".join(f"(?P<p{i}>{pat})" for i, pat in enumerate(_PROP_MAP)), re.IGNORECASE
+)
+# One-pass lenient-JSON tokenizer: "..." passes through, '...' becomes "...",
+# bare keys after { or , get quoted; everything else is copied as-is.
+_LENIENT_TOKEN_RE = re.compile(
+    r'(?P<dq>"(?:[^"\\]|\\.)*")'
+    r"|(?P<sq>'(?:[^'\\]|\\.)*')"
+    r'|(?P<key>[{,]\s*[A-Za-z_][A-Za-z0-9_\-]*)(?=\s*:)',
+    re.DOTALL,
+)
+_KEY_SPLIT_RE  = re.compile(r"[{,]\s*")
+_PREFS_BLOB_RE = re.compile(r"prefs\s*=\s*(\{.*\})")
+_FENCE_RE      = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE | re.DOTALL)
+_JSON_DECODER  = json.JSONDecoder()
+
+def _lenient_token(m: "re.Match[str]") -> str:
+    kind = m.lastgroup
+    tok = m.group()
+    if kind == "dq":
+        return tok
+    if kind == "sq":
+        body = tok[1:-1].replace("\\'", "'").replace('"', '\\"')
+        return f'"{body}"'
+    # bare key:  foo: -> "foo":
+    head = _KEY_SPLIT_RE.match(tok).group()
+    return f'{head}"{tok[len(head):]}"'
+
 def _lenient_json_parse(obj_like: str) -> Optional[Dict[str, Any]]:
     """
     Accepts loose dict-like strings: {min_transit:90, target_rent_to_income:0.33}
@@ -96,11 +212,7 @@ def _lenient_json_parse(obj_like: str) -> Optional[Dict[str, Any]]:
         s = obj_like.strip()
         if not (s.startswith("{") and s.endswith("}")):
             return None
-        # Quote bare keys:  foo: -> "foo":
-        s = re.sub(r'([{,]\s*)([A-Za-z_][A-Za-z0-9_\-]*)(\s*:)', r'\1"\2"\3', s)
-        # Replace single quotes with double quotes
-        s = s.replace("'", '"')
-        return json.loads(s)
+        return json.loads(_LENIENT_TOKEN_RE.sub(_lenient_token, s))
     except Exception:
         return None
 
@@ -115,7 +227,7 @@ def _parse_inline_args(q: str) -> Tuple[str, Dict[str, Any]]:
 
     q_head, tail = q.split("::", 1)
     # Try to grab a full prefs blob first (to avoid splitting inside braces)
-    m = re.search(r"prefs\s*=\s*(\{.*\})", tail)
+    m = _PREFS_BLOB_RE.search(tail)
     prefs_blob = m.group(1) if m else None
     if prefs_blob:
         parsed = _lenient_json_parse(prefs_blob)
@@ -151,16 +263,15 @@ def _auto_args_from_text(user_text: str, args: Dict[str, Any]) -> Dict[str, Any]
     out = dict(args)
 
     if "city" not in out:
-        for c in _CITIES:
-            if c.lower() in text:
-                out["city"] = c
-                break
+        hits = _CITY_RE.findall(text)
+        if hits:
+            out["city"] = min((_CITY_LUT[h] for h in hits), key=_CITY_PRIORITY.__getitem__)
 
     if "property_type" not in out:
-        for pat, norm in _PROP_MAP.items():
-            if re.search(pat, text, re.IGNORECASE):
-                out["property_type"] = norm
-                break
+        # several types named: _PROP_MAP order wins (group p<i> is the i-th entry), like cities
+        hits = [int(m.lastgroup[1:]) for m in _PROP_RE.finditer(text)]
+        if hits:
+            out["property_type"] = _PROP_NORMS[min(hits)]
 
     return out
 
@@ -186,6 +297,14 @@ def _normalize_prefs(enriched_args: Dict[str, Any]) -> None:
     enriched_args["prefs"] = prefs
 
 # ----------------------------- Verify helper (configurable) -----------------------------
+_NO_MATCH_REASON = "No neighborhoods matched the specified criteria"
+# Relaxation hints (at most two are formatted per failed verify)
+_HINT_TPL = (
+    "Try increasing max_distance_km from {md} → {md2}",
+    "Consider lowering min_transit from {mt} → {mt2}",
+    "Consider raising target_rent_to_income from {tri:.2f} → {tri2:.2f}",
+)
+
 def _local_verify(result: Dict[str, Any]) -> Dict[str, Any]:
     if not RP_VERIFY_STRICT:
         return result.get("verify") or {"ok": True}
@@ -218,15 +337,15 @@ def _local_verify(result: Dict[str, Any]) -> Dict[str, Any]:
                 hints: List[str] = []
                 md = prefs.get("max_distance_km")
                 if md is not None and md <= 12:
-                    hints.append(f"Try increasing max_distance_km from {md} → {md+3}")
+                    hints.append(_HINT_TPL[0].format(md=md, md2=md + 3))
                 mt = prefs.get("min_transit")
                 if mt is not None and mt >= 60:
-                    hints.append(f"Consider lowering min_transit from {mt} → {max(mt-5,0)}")
+                    hints.append(_HINT_TPL[1].format(mt=mt, mt2=max(mt - 5, 0)))
                 tri = prefs.get("target_rent_to_income")
-                if tri is not None and tri <= 0.30:
-                    hints.append(f"Consider raising target_rent_to_income from {tri:.2f} → {min(tri+0.03,0.4):.2f}")
-                return {"ok": False, "reasons": ["No neighborhoods matched the specified criteria"] + hints[:2]}
-            return {"ok": False, "reasons": ["No neighborhoods matched the specified criteria"]}
+                if len(hints) < 2 and tri is not None and tri <= 0.30:
+                    hints.append(_HINT_TPL[2].format(tri=tri, tri2=min(tri + 0.03, 0.4)))
+                return {"ok": False, "reasons": [_NO_MATCH_REASON] + hints}
+            return {"ok": False, "reasons": [_NO_MATCH_REASON]}
 
     # Affordability sanity (only if fields exist)
     try:
@@ -246,149 +365,181 @@ def _local_verify(result: Dict[str, Any]) -> Dict[str, Any]:
     return v or {"ok": True}
 
 # ----------------------------- Prompts & Bedrock calls -----------------------------
+_DEFAULT_PLANNING_PROMPT = (
+    "You are RentPilot Orchestrator.\n"
+    "Speak to the planner like a teammate—brief and clear—but output MUST be strict JSON.\n"
+    "Return ONLY:\n"
+    "{ \"plan\": <string>,\n"
+    "  \"actions\": [ { \"tool\": \"get_rent_data\"|\"get_neighbourhood_stats\"|"
+    "\"suggest_neighbourhoods\"|\"evaluate_rent_affordability\",\n"
+    "                 \"args\": <object matching tool schema> } ... ] }\n"
+    "\n"
+    "Schemas:\n"
+    "- get_rent_data.args: { \"city\": <string>, \"property_type\": <\"studio\"|\"1bed\"|\"2bed\"|\"3bed\"> }\n"
+    "- get_neighbourhood_stats.args: { \"city\": <string>, \"property_type\": <string> }\n"
+    "- suggest_neighbourhoods.args: {\n"
+    "    \"city\": <string>, \"property_type\": <string>, \"income_annual\": <number>,\n"
+    "    \"prefs\": { \"max_distance_km\": <number|null>, \"min_transit\": <number|null>, \"target_rent_to_income\": <0..1|null> },\n"
+    "    \"budget_cap\": <number|null>\n"
+    "  }\n"
+    "- evaluate_rent_affordability.args: {\n"
+    "    \"listing_price\": <number>, \"city_median\": <number>,\n"
+    "    \"income_annual\": <number>, \"target_ratio\": <0..1>\n"
+    "  }\n"
+    "Rules: Keep actions minimal. Use provided fields only. JSON only—no prose."
+)
+
+_DEFAULT_FINALIZE_PROMPT = (
+    "You are RentPilot Presenter.\n"
+    "Given tool_results, produce ONLY JSON with keys: plan, actions, verify, answer.\n"
+    "- Make the summary concise, friendly, and plain English.\n"
+    "- Do not invent data; summarize exactly what tools returned.\n"
+    "- JSON only, no extra text."
+)
+
+# prompts/*.txt are static for the life of a container; read them once at import
+_PROMPTS = {
+    "planning": _load_text(PLANNING_PROMPT_PATH),
+    "finalize": _load_text(FINALIZE_PROMPT_PATH),
+}
+
 def _system_prompt_planning() -> str:
     """
     Prefer a humanized prompt from file; fallback to strict JSON prompt.
     """
-    txt = _load_text(PLANNING_PROMPT_PATH)
-    if txt:
-        return txt
-    return (
-        "You are RentPilot Orchestrator.\n"
-        "Speak to the planner like a teammate—brief and clear—but output MUST be strict JSON.\n"
-        "Return ONLY:\n"
-        "{ \"plan\": <string>,\n"
-        "  \"actions\": [ { \"tool\": \"get_rent_data\"|\"get_neighbourhood_stats\"|"
-        "\"suggest_neighbourhoods\"|\"evaluate_rent_affordability\",\n"
-        "                 \"args\": <object matching tool schema> } ... ] }\n"
-        "\n"
-        "Schemas:\n"
-        "- get_rent_data.args: { \"city\": <string>, \"property_type\": <\"studio\"|\"1bed\"|\"2bed\"|\"3bed\"> }\n"
-        "- get_neighbourhood_stats.args: { \"city\": <string>, \"property_type\": <string> }\n"
-        "- suggest_neighbourhoods.args: {\n"
-        "    \"city\": <string>, \"property_type\": <string>, \"income_annual\": <number>,\n"
-        "    \"prefs\": { \"max_distance_km\": <number|null>, \"min_transit\": <number|null>, \"target_rent_to_income\": <0..1|null> },\n"
-        "    \"budget_cap\": <number|null>\n"
-        "  }\n"
-        "- evaluate_rent_affordability.args: {\n"
-        "    \"listing_price\": <number>, \"city_median\": <number>,\n"
-        "    \"income_annual\": <number>, \"target_ratio\": <0..1>\n"
-        "  }\n"
-        "Rules: Keep actions minimal. Use provided fields only. JSON only—no prose."
-    )
+    return _PROMPTS["planning"] or _DEFAULT_PLANNING_PROMPT
 
 def _system_prompt_finalize() -> str:
     """
     Prefer a humanized prompt from file; fallback to strict finalize prompt.
     """
-    txt = _load_text(FINALIZE_PROMPT_PATH)
-    if txt:
-        return txt
-    return (
-        "You are RentPilot Presenter.\n"
-        "Given tool_results, produce ONLY JSON with keys: plan, actions, verify, answer.\n"
-        "- Make the summary concise, friendly, and plain English.\n"
-        "- Do not invent data; summarize exactly what tools returned.\n"
-        "- JSON only, no extra text."
-    )
+    return _PROMPTS["finalize"] or _DEFAULT_FINALIZE_PROMPT
 
 def _converse_json(client, *, model_id: str, system_text: str, user_text: str, max_tokens: int) -> str:
     """
     Bedrock Converse with top-level 'system' and single 'user' turn.
-    Returns concatenated text from content blocks.
+    Returns concatenated text from content blocks (or streamed text deltas).
     """
-    resp = client.converse(
+    request = dict(
         modelId=model_id,
         system=[{"text": system_text}],
         messages=[{"role": "user", "content": [{"text": user_text}]}],
         inferenceConfig={"maxTokens": max_tokens, "temperature": 0.2, "topP": 0.95},
     )
+    if RP_BEDROCK_STREAM:
+        resp = client.converse_stream(**request)
+        parts: List[str] = []
+        for event in resp.get("stream", []):
+            delta = (event.get("contentBlockDelta") or {}).get("delta") or {}
+            if "text" in delta:
+                parts.append(delta["text"])
+        return "".join(parts)
+
+    resp = client.converse(**request)
     content = resp.get("output", {}).get("message", {}).get("content", [])
     return "".join([c.get("text", "") for c in content if isinstance(c, dict)])
 
+def _converse_cached(client, *, model_id: str, system_text: str, user_text: str, max_tokens: int) -> str:
+    """
+    Exact-key cache in front of _converse_json. Identical (model, max_tokens, system, user)
+    inputs return the prior raw text until RP_LLM_CACHE_TTL seconds have passed.
+    """
+    if not RP_LLM_CACHE:
+        return _converse_json(client, model_id=model_id, system_text=system_text,
+                              user_text=user_text, max_tokens=max_tokens)
+
+    key = hashlib.blake2b(
+        f"{model_id}|{max_tokens}|{system_text}|{user_text}".encode("utf-8"), digest_size=16
+    ).hexdigest()
+    now = time.monotonic()
+    hit = _LLM_CACHE.get(key)
+    if hit is not None and now - hit[0] < _LLM_CACHE_TTL:
+        return hit[1]
+
+    text = _converse_json(client, model_id=model_id, system_text=system_text,
+                          user_text=user_text, max_tokens=max_tokens)
+    if text:
+        _LLM_CACHE.pop(key, None)
+        if len(_LLM_CACHE) >= _LLM_CACHE_MAX:
+            # evict expired entries first, then the oldest insert
+            for k in [k for k, (ts, _) in _LLM_CACHE.items() if now - ts >= _LLM_CACHE_TTL]:
+                del _LLM_CACHE[k]
+            while len(_LLM_CACHE) >= _LLM_CACHE_MAX:
+                del _LLM_CACHE[next(iter(_LLM_CACHE))]
+        _LLM_CACHE[key] = (now, text)
+    return text
+
 # ----------------------------- Robust JSON extraction -----------------------------
-def _extract_first_json(text: str) -> Optional[str]:
+def _parse_first_json(text: str) -> Any:
     """
-    Best-effort: find the first top-level {...} JSON object in text.
-    Handles code fences and leading/trailing prose.
-    Returns the substring or None.
+    Best-effort: parse the first top-level {...} JSON object in text.
+    Handles code fences and leading/trailing prose; falls back to parsing the whole text.
+    Locating and parsing both use the stdlib decoder, which (unlike orjson) accepts the
+    NaN/Infinity and big integers models occasionally emit. Raises ValueError if nothing parses.
     """
-    if not text:
-        return None
-    t = text.strip()
+    t = (text or "").strip()
     # remove triple backtick fences if present
     if t.startswith("```"):
-        t = re.sub(r"^```(?:json)?\s*|\s*```$", "", t, flags=re.IGNORECASE | re.DOTALL).strip()
-    # quick path
-    if t.startswith("{") and t.endswith("}"):
+        t = _FENCE_RE.sub("", t).strip()
+    # Let the C decoder find where each candidate object ends; first one that parses wins
+    i = t.find("{")
+    while i != -1:
         try:
-            json.loads(t)
-            return t
-        except Exception:
-            pass
-    # scan for first balanced object
-    starts = [m.start() for m in re.finditer(r"\{", t)]
-    for s in starts:
-        depth = 0
-        for i, ch in enumerate(t[s:], s):
-            if ch == "{":
-                depth += 1
-            elif ch == "}":
-                depth -= 1
-                if depth == 0:
-                    cand = t[s:i+1]
-                    try:
-                        json.loads(cand)
-                        return cand
-                    except Exception:
-                        break
-    return None
+            return _JSON_DECODER.raw_decode(t, i)[0]
+        except ValueError:
+            i = t.find("{", i + 1)
+    return json.loads(text)
 
 # ----------------------------- Planning & Finalize wrappers -----------------------------
 def _converse_plan(model_id: str, clean_query: str, enriched_args: Dict[str, Any]) -> Dict[str, Any]:
     """
     Ask the model for a {plan, actions} JSON. Provide both the query and the parsed args.
+    Rephrased queries with identical args may be served from the semantic cache.
     """
+    cached = semantic_cache.lookup(clean_query, enriched_args)
+    if cached is not None:
+        return cached
+
     user_payload = {"query": clean_query, "args": enriched_args}
-    text = _converse_json(
-        BEDROCK,
+    text = _converse_cached(
+        _get_bedrock(),
         model_id=model_id,
         system_text=_system_prompt_planning(),
-        user_text=json.dumps(user_payload, ensure_ascii=False),
+        user_text=dumps(user_payload),
         max_tokens=_MAX_TOK_PLANNING,
     )
-    candidate = _extract_first_json(text) or text
     try:
-        data = json.loads(candidate)
+        data = _parse_first_json(text)
         if not isinstance(data.get("actions", []), list):
             data["actions"] = []
         if "plan" not in data:
             data["plan"] = "No plan returned"
+        semantic_cache.store(clean_query, enriched_args, data)
         return data
     except Exception:
         return {"plan": f"(unparsed) {text[:2000]}", "actions": []}
 
-def _converse_finalize(model_id: str, clean_query: str, plan: str, actions: List[Dict[str, Any]], tool_result: Dict[str, Any]) -> Dict[str, Any]:
+def _converse_finalize(model_id: str, clean_query: str, plan: str, actions: List[Dict[str, Any]], tool_result: Dict[str, Any],
+                       tool_result_json: Optional[str] = None) -> Dict[str, Any]:
     """
     Provide the actual tool result to the model and ask it to craft a clean ANSWER.
     Preserve the JSON envelope. Keep tool_result echoed for verify alignment.
+    tool_result_json (if given) is the pre-serialized tool_result, shared with the ledger.
     """
     user_payload = {
         "query": clean_query,
         "plan": plan,
         "actions": actions,
-        "tool_result": tool_result
     }
-    text = _converse_json(
-        BEDROCK,
+    text = _converse_cached(
+        _get_bedrock(),
         model_id=model_id,
         system_text=_system_prompt_finalize(),
-        user_text=json.dumps(user_payload, ensure_ascii=False),
+        user_text=dumps_with_raw(user_payload, {"tool_result": tool_result_json or dumps(tool_result)}),
         max_tokens=_MAX_TOK_FINALIZE,
     )
-    candidate = _extract_first_json(text) or text
     try:
-        data = json.loads(candidate)
+        data = _parse_first_json(text)
         pack = {
             "plan": data.get("plan", plan),
             "actions": data.get("actions", actions),
@@ -409,6 +560,39 @@ def _converse_finalize(model_id: str, clean_query: str, plan: str, actions: List
             "tool_result": tool_result,
         }
 
+def _plan_keywords(clean_query: str, enriched_args: Dict[str, Any]) -> Dict[str, Any]:
+    """Slots that fully determine the tool sequence; used as the plan-cache key."""
+    return {
+        "intent": _lazy_import("policy").classify_intent(clean_query),
+        "city": enriched_args.get("city"),
+        "property_type": enriched_args.get("property_type"),
+        "prefs": json.dumps(enriched_args.get("prefs") or {}, sort_keys=True),
+    }
+
+# Intents whose single lookup tool is fully determined by {city, property_type}
+_SYNTH_PLANS = {
+    "city_rent": ("Fetch city median via get_rent_data", "get_rent_data"),
+    "neigh_stats": ("Fetch neighbourhood-level transit/medians via get_neighbourhood_stats", "get_neighbourhood_stats"),
+}
+
+def _maybe_synth_plan(clean_query: str, enriched_args: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Deterministic plan for plain lookups (city + property_type, no budget/income decisions).
+    Returns None whenever the model should plan.
+    """
+    if not RP_PLAN_SYNTH:
+        return None
+    city, prop = enriched_args.get("city"), enriched_args.get("property_type")
+    if not city or not prop:
+        return None
+    if any(enriched_args.get(k) is not None for k in ("listing_price", "income_annual", "budget_cap", "city_median")):
+        return None
+    synth = _SYNTH_PLANS.get(_lazy_import("policy").classify_intent(clean_query))
+    if synth is None:
+        return None
+    plan, tool = synth
+    return {"plan": plan, "actions": [{"tool": tool, "args": {"city": city, "property_type": prop}}]}
+
 # ----------------------------- Orchestrator -----------------------------
 def run_agent(user_input: str, *, print_blocks: bool = True, show_json: bool = False, no_ledger: bool = False) -> Dict[str, Any]:
     """
@@ -419,37 +603,59 @@ def run_agent(user_input: str, *, print_blocks: bool = True, show_json: bool = F
     session_id = os.getenv("LEDGER_SESSION_ID") or "demo-bedrock-session"
     agent_version = os.getenv("AGENT_VERSION", "v2-bedrock")
     model_id = os.getenv("MODEL_ID", "anthropic.claude-3-sonnet-20240229-v1:0")
+    # Right-size per step: planning is structured JSON routing, finalize is user-facing prose
+    planning_model_id = os.getenv("PLANNING_MODEL_ID", "anthropic.claude-3-haiku-20240307-v1:0")
+    finalize_model_id = os.getenv("FINALIZE_MODEL_ID", model_id)
+
+    policy = _lazy_import("policy")
+    ledger = _lazy_import("ledger")
+    ledger_recs: List[Dict[str, Any]] = []
 
     # 1) Parse + enrich args
     clean_q, inline_args = _parse_inline_args(user_input)
     enriched_args = _auto_args_from_text(clean_q, inline_args)
     _normalize_prefs(enriched_args)
 
-    # 2) Planning
-    plan_pack = _converse_plan(model_id, clean_q, enriched_args)
+    # Kick off the deterministic tools now so their latency hides behind planning
+    tool_future = _POOL.submit(policy.decide_and_act, clean_q, enriched_args)
+
+    # 2) Planning: cached template → deterministic synth → model
+    plan_keywords = _plan_keywords(clean_q, enriched_args)
+    plan_source = "cache"
+    plan_pack = plan_cache.lookup(plan_keywords, enriched_args)
+    if plan_pack is None:
+        plan_source = "synth"
+        plan_pack = _maybe_synth_plan(clean_q, enriched_args)
+    if plan_pack is None:
+        plan_source = "llm"
+        plan_pack = _converse_plan(planning_model_id, clean_q, enriched_args)
     if not no_ledger:
-        write_step(
+        ledger_recs.append(ledger.build_step(
             user_query=clean_q, stage="planning",
-            payload={"model_id": model_id, "plan": plan_pack.get("plan"), "actions": plan_pack.get("actions")},
+            payload={"model_id": planning_model_id, "plan": plan_pack.get("plan"), "actions": plan_pack.get("actions"),
+                     "plan_source": plan_source},
             session_id=session_id, agent_version=agent_version, model_id=model_id
-        )
+        ))
 
-    # 3) Execute tools via local policy (deterministic)
+    # 3) Execute tools via local policy (deterministic; started before planning)
     if not no_ledger:
-        write_step(
+        ledger_recs.append(ledger.build_step(
             user_query=clean_q, stage="tool_execute",
             payload={"args": enriched_args},
             session_id=session_id, agent_version=agent_version, model_id=model_id
-        )
-    tool_result = policy.decide_and_act(clean_q, enriched_args)
+        ))
+    tool_result = tool_future.result()
+    # Serialize once; reused verbatim by the finalize prompt and the finalize ledger step
+    tool_result_json = dumps(tool_result)
 
     # 4) Finalize
     final_pack = _converse_finalize(
-        model_id=model_id,
+        model_id=finalize_model_id,
         clean_query=clean_q,
         plan=plan_pack.get("plan", ""),
         actions=plan_pack.get("actions", []),
         tool_result=tool_result,
+        tool_result_json=tool_result_json,
     )
 
     # [NEW] Promote recommendations from tool_result if the model omitted them
@@ -462,22 +668,39 @@ def run_agent(user_input: str, *, print_blocks: bool = True, show_json: bool = F
 
     # 5) Local verify
     final_pack["verify"] = _local_verify(final_pack)
+    if plan_source == "llm" and final_pack["verify"].get("ok") and plan_pack.get("actions"):
+        plan_cache.store(keywords=plan_keywords, template=plan_pack)
 
-    # 6) Ledger
+    # 6) Ledger (batched; flushed in the background — see drain_ledger)
     if not no_ledger:
-        write_step(
+        ledger_recs.append(ledger.build_step(
             user_query=clean_q, stage="finalize",
-            payload=final_pack,
+            payload={k: v for k, v in final_pack.items() if k != "tool_result"},  # snapshot: meta is added below
+            payload_raw={"tool_result": tool_result_json},
             session_id=session_id, agent_version=agent_version, model_id=model_id
-        )
-        entry_meta = write_entry(
+        ))
+        ledger_recs.append(ledger.build_entry(
             user_query=clean_q,
             args=enriched_args,
             result=final_pack,
             session_id=session_id,
             agent_version=agent_version,
             model_id=model_id,
-        )
+        ))
+        # Encode now: the records reference final_pack/enriched_args, which callers may
+        # mutate after we return; only the file/S3 writes happen in the background.
+        head = ledger_recs[0]
+        try:
+            lines = ledger.encode_records(ledger_recs)
+        except Exception as e:
+            print(f"[WARN] ledger records not serializable: {e}")
+            entry_meta = {"ok": False, "error": str(e), "local_path": None}
+        else:
+            fut = _LEDGER_POOL.submit(ledger.write_encoded, lines, len(ledger_recs),
+                                      {"session_id": head["session_id"], "ts": head["ts"]})
+            _LEDGER_PENDING.append(fut)
+            fut.add_done_callback(_ledger_done)
+            entry_meta = {"ok": True, "queued": True, "records": len(ledger_recs), "local_path": ledger.local_path()}
     else:
         entry_meta = {"ok": True, "local_path": None}
 
@@ -491,7 +714,12 @@ def run_agent(user_input: str, *, print_blocks: bool = True, show_json: bool = F
         print(json.dumps(entry_meta, indent=2, ensure_ascii=False))
 
     # Always include meta for UI
-    final_pack.setdefault("meta", {"model_id": model_id, "agent_version": agent_version})
+    final_pack.setdefault("meta", {
+        "model_id": model_id,
+        "planning_model_id": planning_model_id,
+        "finalize_model_id": finalize_model_id,
+        "agent_version": agent_version,
+    })
 
     if show_json:
         # CLI switch prints full envelope
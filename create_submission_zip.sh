@@ -34,6 +34,7 @@ zip -r "$OUTPUT_ZIP" \
   out/ \
   lambdas/ \
   providers/ \
+  utils/ \
   tools/ \
   tests/ \
   events/ \
@@ -1,8 +1,7 @@
 # lambdas/agent_handler.py
-import json
 import os
 
-import agent_bedrock
+from utils.jsonio import dumps, loads
 
 CORS_HEADERS = {
     "Content-Type": "application/json",
@@ -12,25 +11,39 @@ CORS_HEADERS = {
 }
 
 def _resp(status, body):
-    return {"statusCode": status, "headers": CORS_HEADERS, "body": json.dumps(body, ensure_ascii=False)}
+    return {"statusCode": status, "headers": CORS_HEADERS, "body": dumps(body)}
 
 def lambda_handler(event, context):
     # Preflight
     if (event.get("httpMethod") or event.get("requestContext", {}).get("http", {}).get("method")) == "OPTIONS":
         return _resp(200, {"ok": True})
 
+    # Imported only past the preflight check: pulls in the orchestrator + providers
+    import agent_bedrock
+
     try:
         raw = event.get("body") or "{}"
         if event.get("isBase64Encoded"):  # rarely set by API GW, but safe
             import base64
-            raw = base64.b64decode(raw).decode("utf-8", "ignore")
-        data = json.loads(raw) if isinstance(raw, str) else (raw or {})
+            raw = base64.b64decode(raw)  # parsed straight from bytes, no str round-trip
+            try:
+                data = loads(raw)
+            except ValueError:
+                # invalid UTF-8: decode leniently (dropping bad bytes) as before
+                data = loads(raw.decode("utf-8", "ignore"))
+        else:
+            data = loads(raw) if isinstance(raw, str) else (raw or {})
         query = (data.get("query") or "").strip()
         if not query:
             return _resp(400, {"error": "Missing 'query' in JSON body"})
 
         env = agent_bedrock.run_agent(query, print_blocks=False, show_json=True, no_ledger=False)
-        return _resp(200, env)
+        resp = _resp(200, env)
+        # Ledger flushes run in the background; finish them before the container freezes.
+        # One budget for the whole drain (leaving 0.5s headroom) so the built response is kept.
+        remaining_ms = context.get_remaining_time_in_millis() if context else 3000
+        agent_bedrock.drain_ledger(timeout=max(0.0, remaining_ms / 1000.0 - 0.5))
+        return resp
     except Exception as e:
         # Log error for CloudWatch debugging (judges can inspect logs)
         print(f"ERROR in agent_handler: {e}")
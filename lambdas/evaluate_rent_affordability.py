@@ -7,8 +7,9 @@
 # Output example:
 # {"delta_pct":0.04,"rti":0.39,"verdict":"Above market and above target ratio"}
 
-import json
-from typing import Any, Dict
+from typing import Any, Dict, Tuple
+
+from utils.jsonio import dumps, loads
 
 # Named tolerances (readability; values match your original logic)
 _MARKET_BAND = 0.02       # ±2% around city median counts as "near market"
@@ -20,35 +21,34 @@ def _safe_float(x, default=0.0) -> float:
     except Exception:
         return float(default)
 
-def lambda_handler(event, context):
-    """
-    event can be:
-      - direct dict: {"listing_price":2600,"city_median":2500,"income_annual":80000,"target_ratio":0.30}
-      - or API GW proxy with body string / queryStringParameters
-    """
-    try:
-        body = event if isinstance(event, dict) else {}
+def _parse_event(event) -> Dict[str, Any]:
+    """Direct-invoke dict or API GW proxy event -> request body dict."""
+    body = event if isinstance(event, dict) else {}
 
-        # also accept GET testing via queryStringParameters
-        if "queryStringParameters" in body and isinstance(body["queryStringParameters"], dict):
-            qs = body["queryStringParameters"]
-            for k in ("listing_price", "city_median", "income_annual", "target_ratio"):
-                body.setdefault(k, qs.get(k))
+    # also accept GET testing via queryStringParameters
+    if "queryStringParameters" in body and isinstance(body["queryStringParameters"], dict):
+        qs = body["queryStringParameters"]
+        for k in ("listing_price", "city_median", "income_annual", "target_ratio"):
+            body.setdefault(k, qs.get(k))
 
-        # support POST body (proxy integration)
-        if "body" in body and isinstance(body["body"], str):
-            try:
-                body = json.loads(body["body"])
-            except Exception:
-                body = {}
+    # support POST body (proxy integration)
+    if "body" in body and isinstance(body["body"], str):
+        try:
+            body = loads(body["body"])
+        except Exception:
+            body = {}
+    return body
 
+def _core(body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+    """Affordability metrics + verdict; returns (status, payload)."""
+    try:
         listing = _safe_float(body.get("listing_price"))
         city_median = _safe_float(body.get("city_median"))
         income_annual = _safe_float(body.get("income_annual"))
         target_ratio = _safe_float(body.get("target_ratio"), 0.30)
 
         if listing <= 0 or city_median <= 0 or income_annual <= 0:
-            return _resp(400, {
+            return (400, {
                 "error": "invalid_input",
                 "fields": {
                     "listing_price": listing,
@@ -67,37 +67,34 @@ def lambda_handler(event, context):
             "rti": round(rti, 4),
             "verdict": verdict
         }
-        return _resp(200, out)
+        return (200, out)
 
     except Exception as e:
-        return _resp(500, {"error": "internal_error", "reason": str(e)})
+        return (500, {"error": "internal_error", "reason": str(e)})
+
+def lambda_handler(event, context):
+    """
+    event can be:
+      - direct dict: {"listing_price":2600,"city_median":2500,"income_annual":80000,"target_ratio":0.30}
+      - or API GW proxy with body string / queryStringParameters
+    """
+    return _resp(*_core(_parse_event(event)))
+
+# Verdict table: rows = market band (below/near/above), cols = ratio band (below/near/above)
+_VERDICT = (
+    ("Below market and below target ratio", "Below market; near target ratio", "Below market; above target ratio"),
+    ("Near market; below target ratio", "Near market and near target ratio", "Near market; above target ratio"),
+    ("Above market; below target ratio", "Above market; near target ratio", "Above market and above target ratio"),
+)
 
 def _make_verdict(delta_pct: float, rti: float, target_ratio: float) -> str:
-    above_market = delta_pct > _MARKET_BAND
-    below_market = delta_pct < -_MARKET_BAND
-    near_market = not above_market and not below_market
-
-    above_target = rti > (target_ratio + _RATIO_TOL)
-    below_target = rti < (target_ratio - _RATIO_TOL)
-    near_target  = not above_target and not below_target
-
-    if above_market and above_target:
-        return "Above market and above target ratio"
-    if above_market and near_target:
-        return "Above market; near target ratio"
-    if near_market and above_target:
-        return "Near market; above target ratio"
-    if below_market and below_target:
-        return "Below market and below target ratio"
-    if below_market and near_target:
-        return "Below market; near target ratio"
-    if near_market and below_target:
-        return "Near market; below target ratio"
-    return "Near market and near target ratio"
+    mi = 0 if delta_pct < -_MARKET_BAND else 2 if delta_pct > _MARKET_BAND else 1
+    ri = 0 if rti < target_ratio - _RATIO_TOL else 2 if rti > target_ratio + _RATIO_TOL else 1
+    return _VERDICT[mi][ri]
 
 def _resp(status: int, obj: Dict[str, Any]):
     return {
         "statusCode": status,
         "headers": {"Content-Type": "application/json"},
-        "body": json.dumps(obj, ensure_ascii=False)
+        "body": dumps(obj)
     }
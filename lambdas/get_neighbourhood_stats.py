@@ -1,42 +1,33 @@
 # lambdas/get_neighbourhood_stats.py
 # Purpose: Return neighbourhood-level stats (median, transit, distance_km)
 # Source of truth: providers.housing_data (handles LIVE_MODE, S3 URL, local file)
-import json
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 
 from providers.housing_data import (LIVE_MODE, city_key, get_city_obj,
-                                    get_meta, get_neighbourhood_median,
-                                    get_neighbourhood_transit,
-                                    list_neighbourhoods)
+                                    get_meta, neighbourhood_rows)
+from utils.jsonio import dumps, loads
 
 
 def _resp(status: int, obj: Dict[str, Any]):
     return {
         "statusCode": status,
         "headers": {"Content-Type": "application/json"},
-        "body": json.dumps(obj, ensure_ascii=False),
+        "body": dumps(obj),
     }
 
-def _safe_float(x: Any, default: float = 0.0) -> float:
-    try:
-        return float(x)
-    except Exception:
-        return float(default)
+def _parse_event(event) -> Dict[str, Any]:
+    """Direct-invoke dict or API GW proxy event -> request body dict."""
+    body = event if isinstance(event, dict) else {}
+    if "body" in body and isinstance(body["body"], str):
+        try:
+            body = loads(body["body"])
+        except Exception:
+            body = {}
+    return body
 
-def lambda_handler(event, context):
-    """
-    event:
-      {"city":"Toronto","property_type":"1bed"}
-    """
+def _core(body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+    """Neighbourhood rows for a city/property type; returns (status, payload)."""
     try:
-        # Parse
-        body = event if isinstance(event, dict) else {}
-        if "body" in body and isinstance(body["body"], str):
-            try:
-                body = json.loads(body["body"])
-            except Exception:
-                body = {}
-
         city = city_key(body.get("city", "Toronto"))
         prop = (body.get("property_type", "1bed") or "1bed").lower()
 
@@ -44,19 +35,12 @@ def lambda_handler(event, context):
         meta = get_meta()
         city_obj = get_city_obj(city)
         if not city_obj:
-            return _resp(404, {"error": "city_not_found", "city": city})
+            return (404, {"error": "city_not_found", "city": city})
 
-        rows: List[Dict[str, Any]] = []
-        for row in list_neighbourhoods(city):
-            m = get_neighbourhood_median(row, prop)
-            if m is None:
-                continue
-            rows.append({
-                "name": row.get("name"),
-                "median": _safe_float(m),
-                "transit": get_neighbourhood_transit(row, default=0),
-                "distance_km": _safe_float(row.get("distance_km", 0.0)),
-            })
+        rows: List[Dict[str, Any]] = [
+            {"name": name, "median": median, "transit": transit, "distance_km": dist}
+            for name, median, transit, dist in neighbourhood_rows(city, prop)
+        ]
 
         out = {
             "city": city,
@@ -67,10 +51,17 @@ def lambda_handler(event, context):
             "live_mode": LIVE_MODE,
             "neighbourhoods": rows,
         }
-        return _resp(200, out)
+        return (200, out)
 
     except Exception as e:
-        return _resp(500, {"error": "internal_error", "reason": str(e)})
+        return (500, {"error": "internal_error", "reason": str(e)})
+
+def lambda_handler(event, context):
+    """
+    event:
+      {"city":"Toronto","property_type":"1bed"}
+    """
+    return _resp(*_core(_parse_event(event)))
 
 if __name__ == "__main__":
     print(lambda_handler({"city": "Toronto", "property_type": "1bed"}, None))
@@ -1,5 +1,4 @@
-import json
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 
 from providers.housing_data import (LIVE_MODE, city_key, get_city_median,
                                     get_city_obj, get_meta,
@@ -7,17 +6,22 @@ from providers.housing_data import (LIVE_MODE, city_key, get_city_median,
                                     get_neighbourhood_transit,
                                     list_neighbourhoods,
                                     supported_property_types)
+from utils.jsonio import dumps, loads
 
 
-def lambda_handler(event, context):
-    try:
-        body = event if isinstance(event, dict) else {}
-        if "body" in body and isinstance(body["body"], str):
-            try:
-                body = json.loads(body["body"])
-            except Exception:
-                body = {}
+def _parse_event(event) -> Dict[str, Any]:
+    """Direct-invoke dict or API GW proxy event -> request body dict."""
+    body = event if isinstance(event, dict) else {}
+    if "body" in body and isinstance(body["body"], str):
+        try:
+            body = loads(body["body"])
+        except Exception:
+            body = {}
+    return body
 
+def _core(body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+    """City median (+ optional neighbourhood medians); returns (status, payload)."""
+    try:
         city = city_key(body.get("city", "Toronto"))
         prop = (body.get("property_type", "1bed") or "1bed").lower()
         include_neigh = bool(body.get("include_neighbourhoods", True))
@@ -25,11 +29,11 @@ def lambda_handler(event, context):
         meta = get_meta()
         city_obj = get_city_obj(city)
         if not city_obj:
-            return _resp(404, {"error": "city_not_found", "city": city})
+            return (404, {"error": "city_not_found", "city": city})
 
         city_median = get_city_median(city, prop)
         if city_median is None:
-            return _resp(400, {
+            return (400, {
                 "error": "unsupported_property_type",
                 "property_type": prop,
                 "supported": supported_property_types()
@@ -54,14 +58,17 @@ def lambda_handler(event, context):
                     neighs.append({"name": row.get("name"), "median": m})
             out["neighbourhoods"] = neighs
 
-        return _resp(200, out)
+        return (200, out)
 
     except Exception as e:
-        return _resp(500, {"error": "internal_error", "reason": str(e)})
+        return (500, {"error": "internal_error", "reason": str(e)})
+
+def lambda_handler(event, context):
+    return _resp(*_core(_parse_event(event)))
 
 def _resp(status: int, obj: Dict[str, Any]):
     return {
         "statusCode": status,
         "headers": {"Content-Type": "application/json"},
-        "body": json.dumps(obj, ensure_ascii=False)
+        "body": dumps(obj)
     }
@@ -1,59 +1,64 @@
 # lambdas/test_tools.py
-import json
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict
 
-from lambdas.evaluate_rent_affordability import lambda_handler as afford
-from lambdas.get_neighbourhood_stats import lambda_handler as get_stats
-# Import your actual tool handlers
-from lambdas.get_rent_data import lambda_handler as get_rent
-from lambdas.suggest_neighbourhoods import lambda_handler as suggest
+# Tool cores (status, payload) — called in-process, no JSON round-trip per tool
+from lambdas.evaluate_rent_affordability import _core as afford
+from lambdas.get_neighbourhood_stats import _core as get_stats
+from lambdas.get_rent_data import _core as get_rent
+from lambdas.suggest_neighbourhoods import _core as suggest
+from providers.housing_data import get_meta
+from utils.jsonio import dumps
 
 
 def _resp(status: int, obj: Dict[str, Any]):
     return {
         "statusCode": status,
         "headers": {"Content-Type": "application/json"},
-        "body": json.dumps(obj, ensure_ascii=False)
+        "body": dumps(obj)
     }
 
+# The four checks are independent; run them concurrently (reused across warm invocations)
+_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="rp-selftest")
+
 def lambda_handler(event, context):
     try:
-        results = []
+        get_meta()  # warm the shared dataset once so the checks don't race to parse it
 
         # 1) City-level median (no neighbourhoods to keep it fast)
-        r = get_rent({"city": "Toronto", "property_type": "1bed", "include_neighbourhoods": False}, None)
-        ok_r = r.get("statusCode") == 200
-        results.append({"tool": "get_rent_data", "ok": ok_r})
+        f_r = _POOL.submit(get_rent, {"city": "Toronto", "property_type": "1bed", "include_neighbourhoods": False})
 
         # 2) Neighbourhood stats (ensure list present)
-        s = get_stats({"city": "Toronto", "property_type": "1bed"}, None)
-        try:
-            s_body = json.loads(s["body"]) if isinstance(s.get("body"), str) else s.get("body", {})
-        except Exception:
-            s_body = {}
-        ok_s = (s.get("statusCode") == 200 and isinstance(s_body.get("neighbourhoods"), list))
-        results.append({"tool": "get_neighbourhood_stats", "ok": ok_s})
+        f_s = _POOL.submit(get_stats, {"city": "Toronto", "property_type": "1bed"})
 
         # 3) Suggestions (shape only)
-        sg = suggest({
+        f_sg = _POOL.submit(suggest, {
             "city": "Toronto",
             "property_type": "1bed",
             "income_annual": 80000,
             "prefs": {"max_distance_km": 12, "min_transit": 60, "target_rent_to_income": 0.30},
             "budget_cap": 2200
-        }, None)
-        ok_sg = sg.get("statusCode") == 200
-        results.append({"tool": "suggest_neighbourhoods", "ok": ok_sg})
+        })
 
         # 4) Affordability math (shape only)
-        af = afford({
+        f_af = _POOL.submit(afford, {
             "listing_price": 2000,
             "city_median": 1900,
             "income_annual": 72000,
             "target_ratio": 0.30
-        }, None)
-        ok_af = af.get("statusCode") == 200
-        results.append({"tool": "evaluate_rent_affordability", "ok": ok_af})
+        })
+
+        r_status, _ = f_r.result()
+        s_status, s_body = f_s.result()
+        sg_status, _ = f_sg.result()
+        af_status, _ = f_af.result()
+        results = [
+            {"tool": "get_rent_data", "ok": r_status == 200},
+            {"tool": "get_neighbourhood_stats",
+             "ok": s_status == 200 and isinstance(s_body.get("neighbourhoods"), list)},
+            {"tool": "suggest_neighbourhoods", "ok": sg_status == 200},
+            {"tool": "evaluate_rent_affordability", "ok": af_status == 200},
+        ]
 
         return _resp(200, {"ok": all(x["ok"] for x in results), "results": results})
 
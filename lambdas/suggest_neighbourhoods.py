@@ -1,11 +1,12 @@
-import json
+import heapq
 import os
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 
+from providers._kernels import score_kernel
 from providers.housing_data import (LIVE_MODE, city_key, get_city_obj,
-                                    get_meta, get_neighbourhood_median,
-                                    get_neighbourhood_transit,
-                                    list_neighbourhoods)
+                                    get_meta, neighbourhood_columns,
+                                    transit_candidates)
+from utils.jsonio import dumps, loads
 
 _W_AFF = float(os.getenv("FTA_W_AFFORD", "0.5"))
 _W_TRN = float(os.getenv("FTA_W_TRANSIT", "0.3"))
@@ -20,41 +21,35 @@ def _safe_float(x, default=0.0) -> float:
 def _clamp(v: float, lo: float, hi: float) -> float:
     return max(lo, min(hi, v))
 
-def _affordability_component(rti: float, target: float) -> float:
-    if target <= 0:
-        return 0.0
-    over = max(0.0, rti - target)
-    val = 1.0 - (over / max(target, 0.01))
-    return max(0.0, min(1.0, val))
+def _rank_key(s: Tuple[float, int, float]) -> Tuple[float, int]:
+    # candidates arrive in transit order, so the original index breaks score ties
+    return (s[0], -s[1])
 
-def _distance_component(distance_km: float, max_distance_km: float) -> float:
-    if max_distance_km <= 0:
-        return 0.0
-    ratio = min(distance_km / max_distance_km, 1.0)
-    return 1.0 - ratio
-
-def _why(nei: Dict[str, Any], rent_diff: float, rti: float, prefs: Dict[str, Any]) -> str:
+def _why(transit: int, rent_diff: float, rti: float, min_transit: int, target: float) -> str:
+    # min_transit/target are the raw prefs values (unclamped, defaults 0 / 0.30)
     msgs = []
     if rent_diff < 0:
         msgs.append(f"Cheaper by ${int(abs(rent_diff))}/mo")
     else:
         msgs.append(f"${int(rent_diff)}/mo above your price")
-    min_transit = int(prefs.get("min_transit", 0))
-    if int(nei.get("transit", 0)) >= min_transit:
+    if transit >= min_transit:
         msgs.append(f"meets transit ≥{min_transit}")
-    target = float(prefs.get("target_rent_to_income", 0.30))
     msgs.append("at or below {0}% RTI".format(int(target*100)) if rti <= target else f"near {int(target*100)}% target")
     return "; ".join(msgs) + "."
 
-def lambda_handler(event, context):
+def _parse_event(event) -> Dict[str, Any]:
+    """Direct-invoke dict or API GW proxy event -> request body dict."""
+    body = event if isinstance(event, dict) else {}
+    if "body" in body and isinstance(body["body"], str):
+        try:
+            body = loads(body["body"])
+        except Exception:
+            body = {}
+    return body
+
+def _core(body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+    """Top-3 neighbourhood suggestions; returns (status, payload)."""
     try:
-        body = event if isinstance(event, dict) else {}
-        if "body" in body and isinstance(body["body"], str):
-            try:
-                body = json.loads(body["body"])
-            except Exception:
-                body = {}
-
         city = city_key(body.get("city", "Toronto"))
         prop = (body.get("property_type", "1bed") or "1bed").lower()
         income_annual = _safe_float(body.get("income_annual"), 80000.0)
@@ -74,44 +69,37 @@ def lambda_handler(event, context):
 
         meta = get_meta()
         if not get_city_obj(city):
-            return _resp(404, {"error": "city_not_found", "city": city})
-
-        rows: List[Dict[str, Any]] = []
-        for row in list_neighbourhoods(city):
-            med = get_neighbourhood_median(row, prop)
-            if med is None:
-                continue
-
-            transit = get_neighbourhood_transit(row, default=0)
-            dist = max(0.0, _safe_float(row.get("distance_km", 0.0)))
-
-            if dist > max_dist or transit < min_transit:
-                continue
-
-            rti = med / income_monthly if income_monthly > 0 else 1e9
-            if rti > target_rti:
-                continue
-
-            aff = _affordability_component(rti, target_rti)
-            transit_norm = max(0.0, min(1.0, transit / 100.0))
-            dist_comp = _distance_component(dist, max_dist)
-            score = (_W_AFF * aff) + (_W_TRN * transit_norm) + (_W_DST * dist_comp)
-
+            return (404, {"error": "city_not_found", "city": city})
+
+        # Filter + score over the precomputed columns; dicts are built for the top 3 only
+        names, meds, transits, dists = neighbourhood_columns(city, prop)
+        scored = score_kernel(
+            meds, transits, dists,
+            income_monthly=income_monthly, target_rti=target_rti,
+            max_dist=max_dist, min_transit=min_transit,
+            w_aff=_W_AFF, w_trn=_W_TRN, w_dst=_W_DST,
+            candidates=transit_candidates(city, prop, min_transit),
+        )
+        # Partial top-3 selection; ties on score go to the earlier dataset row
+        recs: List[Dict[str, Any]] = []
+        winners = heapq.nlargest(3, scored, key=_rank_key)
+        if winners:
+            why_transit = int(prefs.get("min_transit", 0))
+            why_target = float(prefs.get("target_rent_to_income", 0.30))
+        for score, i, rti in winners:
+            med, transit = meds[i], transits[i]
             rent_diff = med - price_ref
-            rows.append({
-                "name": row.get("name"),
+            recs.append({
+                "name": names[i],
                 "median": med,
                 "rent_diff_vs_listing": int(rent_diff),
                 "rent_to_income": round(rti, 3),
                 "transit": transit,
-                "distance_km": dist,
-                "score": round(score, 3),
-                "why": _why(row, rent_diff, rti, prefs)
+                "distance_km": max(0.0, dists[i]),
+                "score": score,
+                "why": _why(transit, rent_diff, rti, why_transit, why_target)
             })
 
-        rows.sort(key=lambda x: x["score"], reverse=True)
-        recs = rows[:3]
-
         payload = {
             "city": city,
             "property_type": prop,
@@ -124,14 +112,17 @@ def lambda_handler(event, context):
         if not recs:
             payload["reason"] = "no_neighbourhood_passed_filters"
 
-        return _resp(200, payload)
+        return (200, payload)
 
     except Exception as e:
-        return _resp(500, {"error": "internal_error", "reason": str(e)})
+        return (500, {"error": "internal_error", "reason": str(e)})
+
+def lambda_handler(event, context):
+    return _resp(*_core(_parse_event(event)))
 
 def _resp(status: int, obj: Dict[str, Any]):
     return {
         "statusCode": status,
         "headers": {"Content-Type": "application/json"},
-        "body": json.dumps(obj, ensure_ascii=False)
+        "body": dumps(obj)
     }
@@ -1,37 +1,24 @@
 # lambdas/test_health.py
-import json
-import os
-import urllib.request
 from typing import Any, Dict
 
-_DATA_PATH = os.getenv("FTA_DATA_PATH", "data/neighbourhood_medians.json")
-_DATA_URL  = os.getenv("FTA_DATA_URL")  # presigned S3 URL (optional)
-LIVE_MODE  = os.getenv("LIVE_MODE", "0") == "1"
+from providers.housing_data import LIVE_MODE, _load_json, get_meta, list_cities
+from utils.jsonio import dumps
 
 def _resp(status: int, obj: Dict[str, Any]):
     return {
         "statusCode": status,
         "headers": {"Content-Type": "application/json"},
-        "body": json.dumps(obj, ensure_ascii=False)
+        "body": dumps(obj)
     }
 
-def _load_json():
-    if LIVE_MODE and _DATA_URL:
-        with urllib.request.urlopen(_DATA_URL, timeout=3.0) as resp:
-            if resp.status != 200:
-                raise RuntimeError(f"DATA_URL HTTP {resp.status}")
-            return json.loads(resp.read().decode("utf-8"))
-    with open(_DATA_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
-
 def lambda_handler(event, context):
     checks = []
     try:
-        data = _load_json()
+        _load_json()  # shared, cached parse (providers.housing_data)
         checks.append({"name": "load_json", "ok": True})
 
-        meta = data.get("meta", {}) or {}
-        cities = list((data.get("cities", {}) or {}).keys())
+        meta = get_meta()
+        cities = list_cities()
         props = meta.get("property_types") or ["studio", "1bed", "2bed", "3bed"]
 
         checks.append({"name": "city_exists", "ok": bool(cities), "example_city": cities[0] if cities else None})
@@ -7,21 +7,43 @@
 #   LEDGER_LOCAL_PATH="out/ledger.jsonl"  (default)
 #   LEDGER_S3_BUCKET="your-bucket"        (optional to enable S3)
 #   LEDGER_S3_PREFIX="ledger/"            (default)
+#   LEDGER_S3_WORKERS=8                   (background put_object threads)
+#   LEDGER_FLUSH_BYTES=65536              (local buffer flush threshold)
+#   LEDGER_FLUSH_SECS=5                   (flush if the last flush is older than this)
+#   LEDGER_FSYNC=0                        (1 = fsync after each flush)
 #
 # Typical usage:
 #   from ledger import write_entry, write_step
 #   write_step(user_query="...", stage="planning", payload={...}, session_id=..., agent_version="v1", model_id="...")
 #   write_entry(user_query="...", args={...}, result={...}, session_id=..., agent_version="v1", model_id="...")
+#
+# Batched usage (one local append + one S3 object per interaction):
+#   recs = [build_step(...), build_step(...), build_entry(...)]
+#   write_records(recs)
+#   flush()   # wait for queued S3 puts, push buffered local lines to disk
 
-import json
+import atexit
 import os
+import threading
 import time
 import uuid
-from typing import Any, Dict, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from utils.jsonio import dumpb, dumps, dumps_with_raw
 
 # -------- Local JSONL config --------
 _LOCAL_PATH = os.getenv("LEDGER_LOCAL_PATH", "out/ledger.jsonl")
 _ENABLE_LOCAL = os.getenv("LEDGER_LOCAL_ENABLE", "1") == "1"
+_FLUSH_BYTES = int(os.getenv("LEDGER_FLUSH_BYTES", "65536"))
+_FLUSH_SECS = float(os.getenv("LEDGER_FLUSH_SECS", "5"))
+_LEDGER_FSYNC = os.getenv("LEDGER_FSYNC", "0") == "1"
+
+# One append handle per process; lines accumulate in its buffer until a threshold flush
+_LEDGER_FH = None
+_FH_LOCK = threading.Lock()  # write_records may run on the orchestrator's ledger thread
+_UNFLUSHED = 0
+_LAST_FLUSH = time.monotonic()
 
 def _now_iso() -> str:
     return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
@@ -31,7 +53,63 @@ def _ensure_dir(path: str):
     if d and not os.path.exists(d):
         os.makedirs(d, exist_ok=True)
 
-def write_entry(
+def _get_fh():
+    global _LEDGER_FH
+    if _LEDGER_FH is None:
+        _ensure_dir(_LOCAL_PATH)
+        _LEDGER_FH = open(_LOCAL_PATH, "ab", buffering=1 << 16)
+    return _LEDGER_FH
+
+def _flush_locked() -> None:
+    global _UNFLUSHED, _LAST_FLUSH
+    if _LEDGER_FH is not None:
+        _LEDGER_FH.flush()
+        if _LEDGER_FSYNC:
+            os.fsync(_LEDGER_FH.fileno())
+    _UNFLUSHED = 0
+    _LAST_FLUSH = time.monotonic()
+
+def _append_local(data: bytes) -> None:
+    global _UNFLUSHED
+    with _FH_LOCK:
+        _get_fh().write(data)
+        _UNFLUSHED += len(data)
+        if _UNFLUSHED >= _FLUSH_BYTES or time.monotonic() - _LAST_FLUSH >= _FLUSH_SECS:
+            _flush_locked()
+
+def flush(timeout: Optional[float] = None) -> None:
+    """
+    Wait for queued S3 puts, then flush buffered local lines.
+    Call before a Lambda handler returns (the container may freeze afterwards).
+    `timeout` bounds the total wait across all pending puts.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while _S3_PENDING:
+        try:
+            fut = _S3_PENDING.pop(0)
+        except IndexError:
+            break  # the last one finished (and removed itself) meanwhile
+        try:
+            fut.result(timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+        except Exception as e:
+            print(f"[WARN] ledger S3 put incomplete: {e}")
+    with _FH_LOCK:
+        _flush_locked()
+
+@atexit.register
+def _close() -> None:
+    global _LEDGER_FH
+    with _FH_LOCK:
+        if _LEDGER_FH is not None:
+            _flush_locked()
+            _LEDGER_FH.close()
+            _LEDGER_FH = None
+
+def local_path() -> Optional[str]:
+    """Path of the local JSONL ledger, or None when local logging is disabled."""
+    return _LOCAL_PATH if _ENABLE_LOCAL else None
+
+def build_entry(
     *,
     user_query: str,
     args: Dict[str, Any],
@@ -43,7 +121,7 @@ def write_entry(
     """
     Canonical one-line record capturing plan/actions/verify/answer for a single interaction.
     """
-    rec: Dict[str, Any] = {
+    return {
         "ts": _now_iso(),
         "session_id": session_id or str(uuid.uuid4()),
         "agent_version": agent_version,
@@ -55,13 +133,28 @@ def write_entry(
         "verify": result.get("verify"),
         "answer": result.get("answer"),
     }
+
+def write_entry(
+    *,
+    user_query: str,
+    args: Dict[str, Any],
+    result: Dict[str, Any],
+    session_id: Optional[str] = None,
+    agent_version: str = "v1",
+    model_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Write the canonical interaction record (see build_entry) locally and to S3.
+    """
+    rec = build_entry(
+        user_query=user_query, args=args, result=result,
+        session_id=session_id, agent_version=agent_version, model_id=model_id,
+    )
     out: Dict[str, Any] = {"ok": True, "local_path": None}
 
     if _ENABLE_LOCAL:
         try:
-            _ensure_dir(_LOCAL_PATH)
-            with open(_LOCAL_PATH, "a", encoding="utf-8") as f:
-                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            _append_local(dumpb(rec) + b"\n")
             out["local_path"] = _LOCAL_PATH
         except Exception as e:
             out.update({"ok": False, "local_error": str(e)})
@@ -77,32 +170,81 @@ def write_entry(
     return out
 
 # -------- S3 mirroring & step logging --------
-try:
-    import boto3  # type: ignore
-except Exception:
-    boto3 = None  # allows local usage without boto3 installed
-
+# boto3 is imported on the first S3 write only, so importing ledger stays cheap
+# (and works locally without boto3 installed).
 _S3_BUCKET = os.getenv("LEDGER_S3_BUCKET")
 _S3_PREFIX = os.getenv("LEDGER_S3_PREFIX", "ledger/")
-_ENABLE_S3 = bool(_S3_BUCKET) and (boto3 is not None)
+_ENABLE_S3 = bool(_S3_BUCKET)
+_S3_WORKERS = int(os.getenv("LEDGER_S3_WORKERS", "8"))
+
+# Client and put pool are created once per container on first use
+_S3_CLIENT = None
+_S3_POOL: Optional[ThreadPoolExecutor] = None
+_S3_LOCK = threading.Lock()
+_S3_PENDING: List[Future] = []
+
+def _get_s3():
+    global _S3_CLIENT, _ENABLE_S3
+    if _S3_CLIENT is None:
+        with _S3_LOCK:
+            if _S3_CLIENT is None:
+                try:
+                    import boto3  # type: ignore
+                except Exception:
+                    _ENABLE_S3 = False  # no boto3: S3 mirroring silently off, as before
+                    return None
+                _S3_CLIENT = boto3.client("s3")
+    return _S3_CLIENT
+
+def _s3_key(rec: Dict[str, Any], ext: str) -> str:
+    # {prefix}{session_id}/{ts}{ext}; plain join, no per-call format parsing
+    return "".join((_S3_PREFIX, rec["session_id"], "/", rec["ts"], ext))
+
+def _put_s3(key: str, body: bytes) -> None:
+    try:
+        _get_s3().put_object(Bucket=_S3_BUCKET, Key=key, Body=body)
+    except Exception as e:
+        print(f"[WARN] ledger S3 put failed for {key}: {e}")
+        raise
+
+def _put_done(fut: Future) -> None:
+    # Finished puts leave the pending list (failures were already logged by _put_s3), so
+    # warm containers that never reach flush() don't keep every completed future alive
+    try:
+        _S3_PENDING.remove(fut)
+    except ValueError:
+        pass  # already popped by flush()
+
+def _queue_put(key: str, body: bytes) -> str:
+    """Submit a put_object to the background pool; returns the target s3:// URI."""
+    global _S3_POOL
+    _get_s3()  # create the client (and import boto3) once, on the caller's thread
+    if _S3_POOL is None:
+        with _S3_LOCK:
+            if _S3_POOL is None:
+                _S3_POOL = ThreadPoolExecutor(max_workers=_S3_WORKERS, thread_name_prefix="rp-ledger-s3")
+    fut = _S3_POOL.submit(_put_s3, key, body)
+    _S3_PENDING.append(fut)
+    fut.add_done_callback(_put_done)
+    return f"s3://{_S3_BUCKET}/{key}"
 
 def write_entry_s3(rec: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Best-effort S3 write; returns status dict; never raises to caller.
+    Best-effort S3 write, queued to a background thread (see flush); returns status dict;
+    never raises to caller.
     """
     out = {"ok": True, "s3_uri": None}
-    if not _ENABLE_S3:
+    if not _ENABLE_S3 or _get_s3() is None:
         return out
     try:
-        key = f"{_S3_PREFIX}{rec['session_id']}/{rec['ts']}.json"
-        body = json.dumps(rec, ensure_ascii=False).encode("utf-8")
-        boto3.client("s3").put_object(Bucket=_S3_BUCKET, Key=key, Body=body)
-        out["s3_uri"] = f"s3://{_S3_BUCKET}/{key}"
+        key = _s3_key(rec, ".json")
+        out["s3_uri"] = _queue_put(key, dumpb(rec))
+        out["queued"] = True
     except Exception as e:
         out.update({"ok": False, "s3_error": str(e)})
     return out
 
-def write_step(
+def build_step(
     *,
     user_query: str,
     stage: str,
@@ -110,12 +252,13 @@ def write_step(
     session_id: Optional[str] = None,
     agent_version: str = "v1",
     model_id: Optional[str] = None,
+    payload_raw: Optional[Dict[str, str]] = None,
 ) -> Dict[str, Any]:
     """
-    Lightweight step logger to capture intermediate events (e.g., planning, tool_result, finalize).
-    Useful for Day-5 judge transparency without changing your final response shape.
+    Step breadcrumb record (e.g., planning, tool_result, finalize); see write_step.
+    payload_raw maps payload keys to already-serialized JSON (spliced by write_records).
     """
-    rec = {
+    rec: Dict[str, Any] = {
         "ts": _now_iso(),
         "session_id": session_id or str(uuid.uuid4()),
         "agent_version": agent_version,
@@ -124,14 +267,40 @@ def write_step(
         "stage": stage,     # "planning" | "tool_result" | "finalize" | "verify" | etc.
         "payload": payload, # arbitrary dict (tool outputs, deltas, notes)
     }
+    if payload_raw:
+        rec["_payload_raw"] = payload_raw
+    return rec
+
+def _dump_record(rec: Dict[str, Any]) -> str:
+    raw = rec.get("_payload_raw")
+    if not raw:
+        return dumps(rec)
+    body = {k: v for k, v in rec.items() if k != "_payload_raw"}
+    return dumps_with_raw(body, {"payload": dumps_with_raw(body["payload"], raw)})
+
+def write_step(
+    *,
+    user_query: str,
+    stage: str,
+    payload: Dict[str, Any],
+    session_id: Optional[str] = None,
+    agent_version: str = "v1",
+    model_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Lightweight step logger to capture intermediate events (e.g., planning, tool_result, finalize).
+    Useful for Day-5 judge transparency without changing your final response shape.
+    """
+    rec = build_step(
+        user_query=user_query, stage=stage, payload=payload,
+        session_id=session_id, agent_version=agent_version, model_id=model_id,
+    )
 
     # Local append
     local_out = {"ok": True, "local_path": None}
     if _ENABLE_LOCAL:
         try:
-            _ensure_dir(_LOCAL_PATH)
-            with open(_LOCAL_PATH, "a", encoding="utf-8") as f:
-                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            _append_local(dumpb(rec) + b"\n")
             local_out["local_path"] = _LOCAL_PATH
         except Exception as e:
             local_out = {"ok": False, "local_error": str(e)}
@@ -139,3 +308,42 @@ def write_step(
     # Optional S3 mirror
     s3_out = write_entry_s3(rec)
     return {"local": local_out, "s3": s3_out}
+
+def encode_records(recs: List[Dict[str, Any]]) -> bytes:
+    """JSONL bytes for a batch of step/entry records, one line each."""
+    return "".join(_dump_record(r) + "\n" for r in recs).encode("utf-8")
+
+def write_encoded(lines: bytes, count: int, key_rec: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    write_records() for a batch already encoded with encode_records(); key_rec supplies
+    the session_id/ts of the first record for the S3 key. Never raises to caller.
+    """
+    out: Dict[str, Any] = {"ok": True, "local_path": None, "count": count}
+    if not lines:
+        return out
+
+    if _ENABLE_LOCAL:
+        try:
+            _append_local(lines)
+            out["local_path"] = _LOCAL_PATH
+        except Exception as e:
+            out.update({"ok": False, "local_error": str(e)})
+
+    if _ENABLE_S3 and _get_s3() is not None:
+        try:
+            key = _s3_key(key_rec, ".jsonl")
+            out["s3_uri"] = _queue_put(key, lines)
+            out["s3_queued"] = True
+        except Exception as e:
+            out["s3_error"] = str(e)
+
+    return out
+
+def write_records(recs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Flush a batch of step/entry records: one local append and one S3 object
+    ({prefix}{session_id}/{ts}.jsonl holding all lines). Never raises to caller.
+    """
+    if not recs:
+        return {"ok": True, "local_path": None, "count": 0}
+    return write_encoded(encode_records(recs), len(recs), recs[0])
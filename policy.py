@@ -1,12 +1,14 @@
 # policy.py — Day 3 minimal router (local only)
 # Requires: export PYTHONPATH=.
 import json
+import re
 from typing import Any, Dict, Tuple
 
 from lambdas.evaluate_rent_affordability import lambda_handler as tool_afford
 from lambdas.get_neighbourhood_stats import lambda_handler as tool_stats
 from lambdas.get_rent_data import lambda_handler as tool_rent
 from lambdas.suggest_neighbourhoods import lambda_handler as tool_suggest
+from utils.jsonio import loads
 
 SAFE_DEFAULTS = {
     "property_type": "1bed",
@@ -16,18 +18,30 @@ SAFE_DEFAULTS = {
 def _resp(plan: str, actions: list, verify: Dict[str, Any], answer: Dict[str, Any]):
     return {"plan": plan, "actions": actions, "verify": verify, "answer": answer}
 
+# Keyword -> intent table, in priority order (first intent with a hit wins).
+_INTENT_KEYWORDS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("explain", ("what is rti", "what is rent-to-income", "explain transit score", "what is eps")),
+    ("affordability", ("afford", "rti", "rent to income")),
+    ("suggest", ("suggest", "recommend", "neighbourhood", "where should i live")),
+    ("neigh_stats", ("transit",)),
+    ("city_rent", ("median", "rent in", "city median")),
+)
+_INTENT_ORDER = tuple(intent for intent, _ in _INTENT_KEYWORDS)
+# One scan finds every keyword occurrence; the zero-width lookahead lets overlapping
+# keywords (e.g. "rti" inside "what is rti") all register.
+_INTENT_RE = re.compile(
+    "(?=" + "|".join(
+        f"(?P<{intent}>" + "|".join(re.escape(k) for k in sorted(kws, key=len, reverse=True)) + ")"
+        for intent, kws in _INTENT_KEYWORDS
+    ) + ")"
+)
+
 def classify_intent(user_text: str) -> str:
     t = (user_text or "").lower()
-    if any(k in t for k in ["what is rti", "what is rent-to-income", "explain transit score", "what is eps"]):
-        return "explain"
-    if "afford" in t or "rti" in t or "rent to income" in t:
-        return "affordability"
-    if any(k in t for k in ["suggest", "recommend", "neighbourhood", "where should i live"]):
-        return "suggest"
-    if any(k in t for k in ["median", "rent in", "city median"]):
-        return "city_rent"
-    if "transit" in t:
-        return "neigh_stats"
+    hits = {m.lastgroup for m in _INTENT_RE.finditer(t)}
+    for intent in _INTENT_ORDER:
+        if intent in hits:
+            return intent
     return "city_rent"
 
 def fill_defaults(args: Dict[str, Any]) -> Dict[str, Any]:
@@ -42,7 +56,7 @@ def call(tool, args) -> Tuple[int, Dict[str, Any]]:
     r = tool(args, None)
     body = r.get("body")
     try:
-        body = json.loads(body) if isinstance(body, str) else (body or {})
+        body = loads(body) if isinstance(body, (str, bytes)) else (body or {})
     except Exception:
         body = {"raw": body}
     return r.get("statusCode", 500), body
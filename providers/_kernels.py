@@ -0,0 +1,59 @@
+# providers/_kernels.py
+# Hot scoring loop for suggest_neighbourhoods, kept separate from the handler so it can
+# be swapped for a compiled implementation without touching request parsing.
+# Inputs are the column tuples from housing_data.neighbourhood_columns().
+
+from typing import List, Optional, Sequence, Tuple
+
+# (rounded score, row index, rent-to-income)
+Scored = Tuple[float, int, float]
+
+def score_kernel(
+    meds: Sequence[float],
+    transits: Sequence[int],
+    dists: Sequence[float],
+    *,
+    income_monthly: float,
+    target_rti: float,
+    max_dist: float,
+    min_transit: int,
+    w_aff: float,
+    w_trn: float,
+    w_dst: float,
+    candidates: Optional[Sequence[int]] = None,
+) -> List[Scored]:
+    """
+    Filter rows by distance/transit/RTI and score the survivors:
+      w_aff*affordability + w_trn*transit/100 + w_dst*(1 - dist/max_dist), each term in [0, 1].
+    Loop invariants are hoisted and the component helpers are inlined; arithmetic (and so
+    rounding) is identical to the per-row helper version.
+    candidates (optional) restricts the scan to those row indices, in any order; results
+    carry the original index so callers can break ties by dataset order.
+    """
+    out: List[Scored] = []
+    income_on = income_monthly > 0
+    aff_on = target_rti > 0
+    aff_den = max(target_rti, 0.01)
+    dist_on = max_dist > 0
+    for i in (range(len(meds)) if candidates is None else candidates):
+        med, transit, dist = meds[i], transits[i], dists[i]
+        if dist < 0.0:
+            dist = 0.0
+        if dist > max_dist or transit < min_transit:
+            continue
+        rti = med / income_monthly if income_on else 1e9
+        if rti > target_rti:
+            continue
+        aff = 0.0
+        if aff_on:
+            over = rti - target_rti
+            aff = 1.0 - (over / aff_den) if over > 0.0 else 1.0
+            aff = 0.0 if aff < 0.0 else (1.0 if aff > 1.0 else aff)
+        t = transit / 100.0
+        t = 0.0 if t < 0.0 else (1.0 if t > 1.0 else t)
+        dc = 0.0
+        if dist_on:
+            r = dist / max_dist
+            dc = 1.0 - (r if r < 1.0 else 1.0)
+        out.append((round((w_aff * aff) + (w_trn * t) + (w_dst * dc), 3), i, rti))
+    return out
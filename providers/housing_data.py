@@ -2,78 +2,203 @@
 # Single data-access layer for city/neighbourhood medians and transit scores.
 # LIVE_MODE=0 -> internal JSON file at data/neighbourhood_medians.json
 # LIVE_MODE=1 -> S3 JSON via presigned URL FTA_DATA_URL (still a snapshot; no public APIs)
+#                FTA_DATA_TTL=0 keeps the fetched snapshot for the container lifetime; >0
+#                revalidates with If-None-Match after that many seconds (304 = reuse)
 
-import json
+import gzip
+import mmap
 import os
+import time
+import urllib.error
 import urllib.request
+from bisect import bisect_right
+from functools import lru_cache
 from typing import Any, Dict, List, Optional, Tuple
 
+from utils.jsonio import loads
+
 _DATA_PATH = os.getenv("FTA_DATA_PATH", "data/Neighbourhood Medians Patching.json")
 _DATA_URL  = os.getenv("FTA_DATA_URL")                 # presigned S3 URL (GET) when LIVE_MODE=1
 LIVE_MODE  = os.getenv("LIVE_MODE", "0") == "1"
+_DATA_TTL  = float(os.getenv("FTA_DATA_TTL", "0"))
+_ENABLE_EAGER = os.getenv("FTA_EAGER", "1") == "1"     # parse the dataset at import (cold start)
 
 _SUPPORTED_PROPS = ("studio", "1bed", "2bed", "3bed")
-_CACHE: Dict[str, Any] = {}  # in-process memo per Lambda invocation
+_CACHE: Dict[str, Any] = {}  # "dataset" -> (mtime, data); survives warm invocations
+                             # plus live-fetch state: "etag", "fetched_at", "live_failed_at"
+
+# (name, median, transit, distance_km) per neighbourhood with a median for the prop
+NeighRow = Tuple[Any, float, int, float]
+# Column-wise view of the same rows: (names, medians, transits, distances)
+NeighCols = Tuple[Tuple[Any, ...], Tuple[float, ...], Tuple[int, ...], Tuple[float, ...]]
+_EMPTY_COLS: NeighCols = ((), (), (), ())
+
+# Derived from the cached dataset on every (re)load
+_CITIES_NORM: Dict[str, Dict[str, Any]] = {}              # city_key(name) -> city obj
+_CITY_ALIASES: Dict[str, str] = {}                         # lowercased name -> canonical key
+_NEIGH_INDEX: Dict[Tuple[str, str], Tuple[NeighRow, ...]] = {}  # (city_key, prop) -> rows
+_NEIGH_COLS: Dict[Tuple[str, str], NeighCols] = {}              # same rows, column-wise
+# Row indices ordered by transit desc (ties by index) + the matching negated transits (asc)
+_NEIGH_BY_TRANSIT: Dict[Tuple[str, str], Tuple[Tuple[int, ...], Tuple[int, ...]]] = {}
+
+def _as_float(x: Any) -> Optional[float]:
+    try:
+        return float(x) if x is not None else None
+    except Exception:
+        return None
+
+def _medians(raw: Any) -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for k, v in (raw or {}).items():
+        f = _as_float(v)
+        if f is not None:
+            out[str(k).lower()] = f
+    return out
+
+def _canonicalize(data: Any) -> Dict[str, Any]:
+    """
+    Normalize the dataset once per load so lookups are plain dict hits: lowercase float
+    medians (never None), neighbourhoods always a list of dicts, transit pre-normalized
+    into "_transit_i".
+    """
+    if not isinstance(data, dict):
+        data = {}
+    if not isinstance(data.get("meta"), dict):
+        data["meta"] = {}
+    cities = data.get("cities")
+    if not isinstance(cities, dict):
+        cities = data["cities"] = {}
+    for city_obj in cities.values():
+        if not isinstance(city_obj, dict):
+            continue
+        city_obj["medians"] = _medians(city_obj.get("medians"))
+        rows = [r for r in (city_obj.get("neighbourhoods") or []) if isinstance(r, dict)]
+        for row in rows:
+            row["median"] = _medians(row.get("median"))
+            row["_transit_i"] = get_neighbourhood_transit(row, default=0)
+        city_obj["neighbourhoods"] = rows
+    return data
+
+def _set_dataset(mtime: Optional[float], data: Dict[str, Any]) -> Dict[str, Any]:
+    data = _canonicalize(data)
+    _CACHE["dataset"] = (mtime, data)
+    _build_indexes(data)
+    get_city_obj.cache_clear()
+    get_city_median.cache_clear()
+    return data
+
+def _fetch_live(cached: Optional[Tuple[Any, Dict[str, Any]]]) -> Dict[str, Any]:
+    """GET FTA_DATA_URL (gzip-capable); revalidates a cached snapshot via ETag."""
+    headers = {"Accept-Encoding": "gzip"}
+    etag = _CACHE.get("etag")
+    if cached is not None and etag:
+        headers["If-None-Match"] = etag
+    req = urllib.request.Request(_DATA_URL, headers=headers)
+    try:
+        with urllib.request.urlopen(req, timeout=3.0) as resp:
+            if resp.status != 200:
+                raise RuntimeError(f"DATA_URL HTTP {resp.status}")
+            raw = resp.read()
+            if resp.headers.get("Content-Encoding") == "gzip":
+                raw = gzip.decompress(raw)
+            data = loads(raw)
+            _CACHE["etag"] = resp.headers.get("ETag")
+    except urllib.error.HTTPError as e:
+        if e.code == 304 and cached is not None:
+            _CACHE["fetched_at"] = time.monotonic()
+            return cached[1]
+        raise
+    _CACHE["fetched_at"] = time.monotonic()
+    return _set_dataset(None, data)
+
+def _parse_local(path: str) -> Any:
+    # Parse straight from the page cache (orjson reads the mapping; no bytes copy)
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file cannot be mapped
+            return loads(f.read())
+        try:
+            with memoryview(mm) as mv:
+                return loads(mv)
+        finally:
+            mm.close()
 
 def _load_json() -> Dict[str, Any]:
-    if "dataset" in _CACHE:
-        return _CACHE["dataset"]
+    cached = _CACHE.get("dataset")
     if LIVE_MODE and _DATA_URL:
-        try:
-            with urllib.request.urlopen(_DATA_URL, timeout=3.0) as resp:
-                if resp.status != 200:
-                    raise RuntimeError(f"DATA_URL HTTP {resp.status}")
-                data = json.loads(resp.read().decode("utf-8"))
-                _CACHE["dataset"] = data
+        live_cached = cached is not None and cached[0] is None
+        # After a failed fetch, serve the local fallback until FTA_DATA_TTL expires (for
+        # the container's lifetime when unset) instead of retrying the network per call.
+        stamp = _CACHE.get("live_failed_at")
+        if live_cached:
+            stamp = max(stamp or 0.0, _CACHE.get("fetched_at", 0.0))
+        retry = stamp is None or (_DATA_TTL > 0 and time.monotonic() - stamp >= _DATA_TTL)
+        if live_cached and not retry:
+            return cached[1]
+        if retry:
+            try:
+                data = _fetch_live(cached if live_cached else None)
+                _CACHE.pop("live_failed_at", None)
                 return data
-        except Exception as e:
-            print(f"[WARN] Falling back to local JSON due to: {e}")
+            except Exception as e:
+                _CACHE["live_failed_at"] = time.monotonic()
+                if live_cached:
+                    print(f"[WARN] Keeping cached live dataset; revalidation failed: {e}")
+                    return cached[1]
+                print(f"[WARN] Falling back to local JSON due to: {e}")
 
-    with open(_DATA_PATH, "r", encoding="utf-8") as f:
-        data = json.load(f)
-        _CACHE["dataset"] = data
-        return data
+    mtime = os.stat(_DATA_PATH).st_mtime
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    return _set_dataset(mtime, _parse_local(_DATA_PATH))
 
 def city_key(city: str) -> str:
-    return str(city or "").strip().title()
+    s = str(city or "").strip()
+    return _CITY_ALIASES.get(s.lower()) or s.title()
+
+def _canon(city: str) -> str:
+    # Handlers pass city_key() output already; only re-normalize on a miss
+    return city if city in _CITIES_NORM else city_key(city)
 
 def supported_property_types() -> Tuple[str, ...]:
     return _SUPPORTED_PROPS
 
 def get_meta() -> Dict[str, Any]:
     data = _load_json()
-    return data.get("meta", {}) or {}
+    return data["meta"]
 
+def list_cities() -> List[str]:
+    _load_json()
+    return list(_CITIES_NORM)
+
+# Memoized per warm container; both caches are cleared whenever the dataset (re)loads.
+# A hit skips the mtime check, which the handlers' get_meta() call still performs.
+@lru_cache(maxsize=16)
 def get_city_obj(city: str) -> Optional[Dict[str, Any]]:
-    data = _load_json()
-    return (data.get("cities", {}) or {}).get(city_key(city))
+    _load_json()
+    return _CITIES_NORM.get(_canon(city))
 
+@lru_cache(maxsize=64)
 def get_city_median(city: str, prop: str) -> Optional[float]:
-    prop = (prop or "1bed").lower()
     city_obj = get_city_obj(city)
     if not city_obj:
         return None
-    med = (city_obj.get("medians", {}) or {}).get(prop)
-    try:
-        return float(med) if med is not None else None
-    except Exception:
-        return None
+    return city_obj["medians"].get((prop or "1bed").lower())
 
 def list_neighbourhoods(city: str) -> List[Dict[str, Any]]:
     city_obj = get_city_obj(city)
     if not city_obj:
         return []
-    return (city_obj.get("neighbourhoods", []) or [])
+    return city_obj["neighbourhoods"]
 
 def get_neighbourhood_median(row: Dict[str, Any], prop: str) -> Optional[float]:
-    prop = (prop or "1bed").lower()
-    med = (row.get("median", {}) or {}).get(prop)
-    try:
-        return float(med) if med is not None else None
-    except Exception:
-        return None
+    # rows come from the canonicalized dataset: "median" is a lowercase float dict
+    return row["median"].get((prop or "1bed").lower())
 
 def normalize_transit(x: Any) -> Optional[int]:
+    if type(x) is int and 0 <= x <= 100:  # dataset values are mostly in-range ints already
+        return x
     try:
         val = float(x)
     except Exception:
@@ -84,7 +209,82 @@ def normalize_transit(x: Any) -> Optional[int]:
     return int(round(val))
 
 def get_neighbourhood_transit(row: Dict[str, Any], default: int = 0) -> int:
+    pre = row.get("_transit_i")
+    if pre is not None:
+        return pre
     norm = normalize_transit(row.get("transit", default))
     if norm is None:
         return max(0, min(100, int(default)))
     return norm
+
+def _distance_km(row: Dict[str, Any]) -> float:
+    try:
+        return float(row.get("distance_km", 0.0))
+    except Exception:
+        return 0.0
+
+def _build_indexes(data: Dict[str, Any]) -> None:
+    global _CITIES_NORM, _CITY_ALIASES, _NEIGH_INDEX, _NEIGH_COLS, _NEIGH_BY_TRANSIT
+    cities: Dict[str, Dict[str, Any]] = {}
+    aliases: Dict[str, str] = {}
+    for k, v in data["cities"].items():
+        if not isinstance(v, dict):
+            continue
+        raw = str(k).strip()
+        canon = raw.title()
+        cities[canon] = v
+        aliases[raw.lower()] = aliases[canon.lower()] = canon
+    index: Dict[Tuple[str, str], Tuple[NeighRow, ...]] = {}
+    for ck, city_obj in cities.items():
+        rows = city_obj["neighbourhoods"]
+        props = set(_SUPPORTED_PROPS)
+        for r in rows:
+            props.update(r["median"])
+        for prop in props:
+            out: List[NeighRow] = []
+            for row in rows:
+                m = get_neighbourhood_median(row, prop)
+                if m is None:
+                    continue
+                out.append((row.get("name"), m, row["_transit_i"], _distance_km(row)))
+            index[(ck, prop)] = tuple(out)
+    cols = {k: (tuple(zip(*rows)) or _EMPTY_COLS) for k, rows in index.items()}
+    by_transit = {}
+    for k, rows in index.items():
+        order = tuple(sorted(range(len(rows)), key=lambda i, rows=rows: (-rows[i][2], i)))
+        by_transit[k] = (order, tuple(-rows[i][2] for i in order))
+    # Publish fully built dicts by rebinding (never clear/refill in place), so a reader on
+    # another thread sees either the previous indexes or the new ones, not empty/partial ones
+    _CITIES_NORM, _CITY_ALIASES, _NEIGH_INDEX, _NEIGH_COLS, _NEIGH_BY_TRANSIT = (
+        cities, aliases, index, cols, by_transit)
+
+def neighbourhood_rows(city: str, prop: str) -> Tuple[NeighRow, ...]:
+    """
+    Precomputed (name, median, transit, distance_km) rows for a city/property type,
+    skipping neighbourhoods without a median. Built once per dataset load.
+    """
+    _load_json()
+    return _NEIGH_INDEX.get((_canon(city), (prop or "1bed").lower()), ())
+
+def neighbourhood_columns(city: str, prop: str) -> NeighCols:
+    """Struct-of-arrays form of neighbourhood_rows(): (names, medians, transits, distances)."""
+    _load_json()
+    return _NEIGH_COLS.get((_canon(city), (prop or "1bed").lower()), _EMPTY_COLS)
+
+def transit_candidates(city: str, prop: str, min_transit: int) -> Tuple[int, ...]:
+    """
+    Indices into neighbourhood_columns() rows with transit >= min_transit, via binary
+    search on the transit-sorted index (highest transit first, ties in dataset order).
+    """
+    _load_json()
+    entry = _NEIGH_BY_TRANSIT.get((_canon(city), (prop or "1bed").lower()))
+    if entry is None:
+        return ()
+    order, neg_transit = entry
+    return order[:bisect_right(neg_transit, -min_transit)]
+
+if _ENABLE_EAGER:
+    try:
+        _load_json()
+    except Exception as e:
+        print(f"[WARN] Eager dataset load skipped: {e}")
@@ -0,0 +1,83 @@
+# providers/plan_cache.py
+# Agentic plan caching: reuse {plan, actions} templates from verified runs.
+# Templates are keyed by extracted slots (city, property_type, intent, prefs signature),
+# so a later request in the same bucket skips the planning LLM call entirely; the
+# current args are merged into the template's actions[*].args on the way out.
+#
+# Env:
+#   RP_PLAN_CACHE=1                            (default 0)
+#   RP_PLAN_CACHE_PATH="/tmp/rp_plan_cache.json"
+#   RP_PLAN_CACHE_MAX=256                      (LRU eviction)
+
+import copy
+import json
+import os
+from typing import Any, Dict, Optional
+
+ENABLED = os.getenv("RP_PLAN_CACHE", "0") == "1"
+_PATH   = os.getenv("RP_PLAN_CACHE_PATH", "/tmp/rp_plan_cache.json")
+_MAX    = int(os.getenv("RP_PLAN_CACHE_MAX", "256"))
+
+_TEMPLATES: Dict[str, Dict[str, Any]] = {}  # insertion order == LRU order
+_LOADED = False
+
+def _key(keywords: Dict[str, Any]) -> str:
+    return json.dumps(keywords, sort_keys=True, ensure_ascii=False, default=str)
+
+def _ensure_loaded() -> None:
+    global _LOADED
+    if _LOADED:
+        return
+    _LOADED = True
+    try:
+        with open(_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            for k, v in list(data.items())[-_MAX:]:
+                if isinstance(v, dict):
+                    _TEMPLATES[k] = v
+    except Exception:
+        pass  # cold cache
+
+def _persist() -> None:
+    try:
+        d = os.path.dirname(_PATH)
+        if d and not os.path.exists(d):
+            os.makedirs(d, exist_ok=True)
+        with open(_PATH, "w", encoding="utf-8") as f:
+            json.dump(_TEMPLATES, f, ensure_ascii=False)
+    except Exception:
+        pass  # best-effort
+
+def _fill(template: Dict[str, Any], args: Dict[str, Any]) -> Dict[str, Any]:
+    out = copy.deepcopy(template)
+    actions = out.get("actions") if isinstance(out.get("actions"), list) else []
+    for a in actions:
+        if isinstance(a, dict) and isinstance(a.get("args"), dict):
+            a["args"].update({k: copy.deepcopy(args[k]) for k in a["args"] if k in args})
+    out["actions"] = actions
+    return out
+
+def lookup(keywords: Dict[str, Any], args: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Return the cached template for these slots with `args` merged in, or None."""
+    if not ENABLED:
+        return None
+    _ensure_loaded()
+    k = _key(keywords)
+    tpl = _TEMPLATES.pop(k, None)
+    if tpl is None:
+        return None
+    _TEMPLATES[k] = tpl  # mark most-recently used
+    return _fill(tpl, args)
+
+def store(*, keywords: Dict[str, Any], template: Dict[str, Any]) -> None:
+    """Save a {plan, actions} template from a verified run."""
+    if not ENABLED:
+        return
+    _ensure_loaded()
+    k = _key(keywords)
+    _TEMPLATES.pop(k, None)
+    _TEMPLATES[k] = {"plan": template.get("plan"), "actions": copy.deepcopy(template.get("actions") or [])}
+    while len(_TEMPLATES) > _MAX:
+        del _TEMPLATES[next(iter(_TEMPLATES))]
+    _persist()
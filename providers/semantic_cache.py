@@ -0,0 +1,109 @@
+# providers/semantic_cache.py
+# Semantic cache for planning responses ({plan, actions}).
+# Rephrasings like "median 1-bed rent in Toronto" vs "what's the 1 bed rent in Toronto"
+# miss the exact-key LLM cache but produce the same plan. We embed the query as an
+# L2-normalised bag of hashed character trigrams and reuse a cached plan when cosine
+# similarity to a prior query with the SAME args signature clears RP_SEM_THRESHOLD.
+# Pure stdlib on purpose: no model download or native wheel in the Lambda bundle.
+#
+# Env:
+#   RP_SEM_CACHE=1                        (default 0; opt-in since hits are approximate)
+#   RP_SEM_THRESHOLD=0.92
+#   RP_SEM_CACHE_PATH="/tmp/rp_semcache.json"   (persists across warm invocations)
+#   RP_SEM_CACHE_MAX=256
+
+import copy
+import json
+import math
+import os
+import re
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+ENABLED    = os.getenv("RP_SEM_CACHE", "0") == "1"
+_THRESHOLD = float(os.getenv("RP_SEM_THRESHOLD", "0.92"))
+_PATH      = os.getenv("RP_SEM_CACHE_PATH", "/tmp/rp_semcache.json")
+_MAX       = int(os.getenv("RP_SEM_CACHE_MAX", "256"))
+_DIM       = 4096  # hash buckets for trigrams
+
+_NON_WORD_RE = re.compile(r"[^a-z0-9]+")
+
+# entries: [{"sig": str, "query": str, "plan": {...}}]; vectors kept alongside (not persisted)
+_ENTRIES: List[Dict[str, Any]] = []
+_VECTORS: List[Dict[int, float]] = []
+_LOADED = False
+
+def _embed(text: str) -> Dict[int, float]:
+    t = " " + _NON_WORD_RE.sub(" ", (text or "").lower()).strip() + " "
+    vec: Dict[int, float] = {}
+    for i in range(len(t) - 2):
+        b = zlib.crc32(t[i:i+3].encode("utf-8")) % _DIM
+        vec[b] = vec.get(b, 0.0) + 1.0
+    norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+    return {k: v / norm for k, v in vec.items()}
+
+def _cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+def _signature(args: Dict[str, Any]) -> str:
+    return json.dumps(args or {}, sort_keys=True, ensure_ascii=False, default=str)
+
+def _ensure_loaded() -> None:
+    global _LOADED
+    if _LOADED:
+        return
+    _LOADED = True
+    try:
+        with open(_PATH, "r", encoding="utf-8") as f:
+            rows = json.load(f)
+        for r in rows[-_MAX:]:
+            if isinstance(r, dict) and isinstance(r.get("plan"), dict):
+                _ENTRIES.append(r)
+                _VECTORS.append(_embed(r.get("query", "")))
+    except Exception:
+        pass  # missing/corrupt cache file just means a cold cache
+
+def _persist() -> None:
+    try:
+        d = os.path.dirname(_PATH)
+        if d and not os.path.exists(d):
+            os.makedirs(d, exist_ok=True)
+        with open(_PATH, "w", encoding="utf-8") as f:
+            json.dump(_ENTRIES, f, ensure_ascii=False)
+    except Exception:
+        pass  # best-effort; the in-memory cache still works
+
+def lookup(query: str, args: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Return a copy of the cached plan for the most similar prior query with identical
+    args, or None when nothing clears the threshold.
+    """
+    if not ENABLED:
+        return None
+    _ensure_loaded()
+    sig = _signature(args)
+    emb = _embed(query)
+    best: Tuple[float, int] = (-1.0, -1)
+    for i, e in enumerate(_ENTRIES):
+        if e["sig"] != sig:
+            continue
+        sim = _cosine(emb, _VECTORS[i])
+        if sim > best[0]:
+            best = (sim, i)
+    if best[1] < 0 or best[0] < _THRESHOLD:
+        return None
+    return copy.deepcopy(_ENTRIES[best[1]]["plan"])
+
+def store(query: str, args: Dict[str, Any], plan: Dict[str, Any]) -> None:
+    """Remember a successfully parsed plan; oldest entries are evicted past RP_SEM_CACHE_MAX."""
+    if not ENABLED:
+        return
+    _ensure_loaded()
+    _ENTRIES.append({"sig": _signature(args), "query": query, "plan": copy.deepcopy(plan)})
+    _VECTORS.append(_embed(query))
+    if len(_ENTRIES) > _MAX:
+        del _ENTRIES[:-_MAX]
+        del _VECTORS[:-_MAX]
+    _persist()
@@ -0,0 +1,100 @@
+# tools/_cmhc_cache.py
+# Parsed-input memo shared by merge_cmhc.py and patch_toronto_aliases.py.
+# Both scripts read the same static CMHC snapshots; results are pickled in one cache
+# dir keyed by (tag, path, mtime_ns, size), so whichever script runs second (or a rerun)
+# pays a pickle load instead of a JSON parse.
+# Unpickling runs code from the cache dir, so it must be private: it is created 0700 and
+# a dir that is not owned by the current user, or is group/other-writable, is not used.
+#
+# Env:
+#   CMHC_CACHE_DIR="${XDG_CACHE_HOME:-~/.cache}/rentpilot-cmhc"
+#   CMHC_CACHE=0                               (disable; always parse)
+
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import stat
+import sys
+import tempfile
+from pathlib import Path
+
+try:
+    import orjson  # type: ignore
+except Exception:
+    orjson = None  # stdlib fallback keeps the tools dependency-free
+
+ENABLED = os.getenv("CMHC_CACHE", "1") == "1"
+CACHE_DIR = Path(os.getenv("CMHC_CACHE_DIR")
+                 or os.path.join(os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "rentpilot-cmhc"))
+
+_DIR_OK = None  # checked once per process
+
+def parse(path):
+    """Parse a JSON file (no caching)."""
+    if orjson is None:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    # orjson reads the file-backed mapping directly: no bytes copy of the whole file
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file cannot be mapped
+            return orjson.loads(f.read())
+        try:
+            with memoryview(mm) as mv:
+                return orjson.loads(mv)
+        finally:
+            mm.close()
+
+def _cache_file(path, tag: str) -> Path:
+    p = Path(path).resolve()
+    st = p.stat()
+    key = hashlib.blake2b(f"{tag}:{st.st_mtime_ns}:{st.st_size}:{p}".encode("utf-8"), digest_size=16)
+    return CACHE_DIR / f"cmhc_{key.hexdigest()}.pkl"
+
+def _private_dir() -> bool:
+    global _DIR_OK
+    if _DIR_OK is None:
+        try:
+            CACHE_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+            st = os.lstat(CACHE_DIR)
+            _DIR_OK = (stat.S_ISDIR(st.st_mode)
+                       and (not hasattr(os, "getuid") or st.st_uid == os.getuid())
+                       and not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH))
+        except OSError:
+            _DIR_OK = False
+        if not _DIR_OK:
+            print(f"[WARN] CMHC cache disabled: {CACHE_DIR} is not a private directory", file=sys.stderr)
+    return _DIR_OK
+
+def load(path, build=None, tag: str = "doc"):
+    """
+    Parsed JSON at `path`, or build(parsed) when `build` is given (cached under `tag`;
+    change the tag whenever build's output shape changes). A build miss goes through
+    the "doc" entry, so the parse itself is shared too. Cache errors fall back to parsing.
+    """
+    if not ENABLED or not _private_dir():
+        return build(parse(path)) if build else parse(path)
+    cache = _cache_file(path, tag)
+    try:
+        with open(cache, "rb") as f:
+            return pickle.load(f)
+    except Exception:
+        pass  # cold, corrupt or stale entry (missing class, bad data...): rebuild
+    value = build(load(path)) if build else parse(path)
+    tmp = None
+    try:
+        fd, tmp = tempfile.mkstemp(dir=CACHE_DIR, prefix=cache.name, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(value, f, protocol=5)
+        os.replace(tmp, cache)  # atomic: concurrent loaders never see a partial pickle
+    except Exception:
+        if tmp is not None:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+        # unwritable cache dir or unpicklable value; the value is still returned
+    return value
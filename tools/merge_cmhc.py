@@ -1,8 +1,19 @@
 # tools/merge_cmhc.py
 import json
+import os
 import pathlib
 import re
+import shutil
 import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import _cmhc_cache
+
+try:
+    import orjson  # type: ignore
+except Exception:
+    orjson = None  # stdlib fallback keeps the tool dependency-free
 
 USAGE = """
 Usage:
@@ -12,20 +23,61 @@ Usage:
                               out/Neighbourhood-Medians-Oct2024.json
 """
 
+# display casing per city token; insertion order is the match priority
+_CITY_DISPLAY = {"toronto": "Toronto", "vancouver": "Vancouver", "montreal": "Montreal",
+                 "ottawa": "Ottawa", "calgary": "Calgary", "edmonton": "Edmonton",
+                 "quebec": "Quebec City", "winnipeg": "Winnipeg", "hamilton": "Hamilton"}
+_CITY_PRIORITY = {c: i for i, c in enumerate(_CITY_DISPLAY)}
+_CITY_RE = re.compile("|".join(_CITY_DISPLAY))
+
+# CMHC_MERGE_RAW=1 copies each input's bytes under its city key instead of re-indenting
+# it: no serialized copy of the input is built, but the output keeps the inputs' layout.
+_RAW_COPY = os.getenv("CMHC_MERGE_RAW", "0") == "1"
+
+# parsed inputs alive at once while streaming: the one being written plus those loading ahead
+_PREFETCH = 2
+
 def guess_city_from_name(path: str) -> str:
-    s = pathlib.Path(path).name.lower()
-    for city in ["toronto", "vancouver", "montreal", "ottawa", "calgary", "edmonton", "quebec", "winnipeg", "hamilton"]:
-        if city in s:
-            # normalize display casing
-            return {"toronto":"Toronto","vancouver":"Vancouver","montreal":"Montreal",
-                    "ottawa":"Ottawa","calgary":"Calgary","edmonton":"Edmonton",
-                    "quebec":"Quebec City","winnipeg":"Winnipeg","hamilton":"Hamilton"}[city]
+    name = pathlib.Path(path)
+    hits = _CITY_RE.findall(name.name.lower())
+    if hits:
+        # several city tokens in one name: earliest in the list wins, as before
+        return _CITY_DISPLAY[min(hits, key=_CITY_PRIORITY.__getitem__)]
     # fallback: filename stem
-    return pathlib.Path(path).stem
+    return name.stem
 
 def load_json(path: str):
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    # parse memoized on disk across runs and shared with patch_toronto_aliases
+    return _cmhc_cache.load(path)
+
+def dumpb_indent(obj) -> bytes:
+    # same bytes as json.dumps(obj, indent=2, ensure_ascii=False) for JSON-native data
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+
+def load_prefetched(paths):
+    # Yield load_json(p) in order while the next inputs load on worker threads; at most
+    # _PREFETCH parsed documents are alive so the merge stays streaming.
+    ahead = max(_PREFETCH - 1, 1)
+    with ThreadPoolExecutor(max_workers=ahead) as ex:
+        it = iter(paths)
+        pending = deque(ex.submit(load_json, p) for _, p in zip(range(ahead), it))
+        while pending:
+            data = pending.popleft().result()
+            nxt = next(it, None)
+            if nxt is not None:
+                pending.append(ex.submit(load_json, nxt))  # loads while `data` is written
+            yield data
+            del data
+
+def _meta_for(data):
+    # small sanity metadata: counts if structure is list-like
+    if isinstance(data, list):
+        return {"items": len(data)}
+    if isinstance(data, dict):
+        return {"keys": len(data)}
+    return {"type": type(data).__name__}
 
 def main():
     if len(sys.argv) < 5:
@@ -33,33 +85,55 @@ def main():
         sys.exit(2)
 
     *inputs, out_path = sys.argv[1:]
-    merged = {
-        "version": "CMHC Oct 2024",
-        "source": "local-merged",
-        "cities": {}  # { "Toronto": <dataset>, ... }
-    }
 
+    # city -> input path; a repeated city keeps its first position but the last file wins
+    # (same as assigning into the merged dict)
+    sources = {}
     for p in inputs:
-        city = guess_city_from_name(p)
-        data = load_json(p)
-        merged["cities"][city] = data
+        sources[guess_city_from_name(p)] = p
 
-    # small sanity metadata: counts if structure is list-like
+    # Stream the merged document: at most _PREFETCH parsed inputs are alive instead of
+    # all of them plus the full serialized output. Layout matches json.dump(merged, indent=2)
+    # unless _RAW_COPY is set.
+    # Written to a temp file beside out_path and moved into place only once complete, so
+    # a bad input (caught mid-stream) leaves an existing merged file untouched.
     meta = {}
-    for city, data in merged["cities"].items():
-        if isinstance(data, list):
-            meta[city] = {"items": len(data)}
-        elif isinstance(data, dict):
-            meta[city] = {"keys": len(data)}
-        else:
-            meta[city] = {"type": type(data).__name__}
-    merged["meta"] = meta
-
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(merged, f, ensure_ascii=False, indent=2)
-
-    print(f"Wrote {out_path}")
-    print(json.dumps({"cities": list(merged["cities"].keys()), "meta": meta}, indent=2))
+    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(b'{\n  "version": "CMHC Oct 2024",\n  "source": "local-merged",\n  "cities": {')
+            for i, ((city, p), data) in enumerate(zip(sources.items(), load_prefetched(sources.values()))):
+                meta[city] = _meta_for(data)  # still parsed: validates the input and feeds meta
+                f.write((b"," if i else b"") + b"\n    " + dumpb_indent(city) + b": ")
+                if _RAW_COPY:
+                    del data
+                    with open(p, "rb") as src:
+                        shutil.copyfileobj(src, f)
+                    continue
+                body = dumpb_indent(data).replace(b"\n", b"\n    ")
+                f.write(body)
+                del data, body
+            f.write(b"\n  }" if sources else b"}")
+            meta_body = dumpb_indent(meta).replace(b"\n", b"\n  ")
+            f.write(b',\n  "meta": ' + meta_body + b"\n}")
+        try:
+            os.chmod(tmp_path, os.stat(out_path).st_mode & 0o7777)  # keep an existing file's mode
+        except OSError:
+            pass
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    print(f"Wrote {out_path}", flush=True)
+    # summary reuses the meta block already serialized for the output (same indent-2 layout)
+    cities_body = dumpb_indent(list(sources)).replace(b"\n", b"\n  ")
+    sys.stdout.buffer.write(b'{\n  "cities": ' + cities_body + b',\n  "meta": ' + meta_body + b"\n}\n")
+    sys.stdout.flush()
 
 if __name__ == "__main__":
     main()
@@ -2,33 +2,83 @@
 # and build a patched neighbourhood_medians.json using friendly names aliased
 # to plausible CMHC zones with 1-bed values. Create output files and show paths.
 
+import heapq
 import json
+import os
 import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, fields
 from pathlib import Path
+from typing import Dict, Optional
 
-# Inputs (uploaded to the notebook environment)
-base = Path("/mnt/data")
-toronto_path = base / "toronto_112.json"
-van_path = base / "Vancouver_112.json"
-mtl_path = base / "Montreal_112.json"
+import _cmhc_cache
 
-def load_json(p: Path):
-    return json.loads(p.read_text(encoding="utf-8"))
+try:
+    import orjson  # type: ignore
+except Exception:
+    orjson = None  # stdlib fallback keeps the script dependency-free
 
-tor = load_json(toronto_path)
-van = load_json(van_path)
-mtl = load_json(mtl_path)
+# Inputs (uploaded to the notebook environment)
+DATA_DIR = "/mnt/data"
+TORONTO_PATH = Path(DATA_DIR + "/toronto_112.json")
+VAN_PATH = Path(DATA_DIR + "/Vancouver_112.json")
+MTL_PATH = Path(DATA_DIR + "/Montreal_112.json")
+
+# Outputs
+OUT_DIR = Path(DATA_DIR + "/patched")
+PATCHED_PATH = Path(DATA_DIR + "/patched/neighbourhood_medians_patched.json")
+MAP_PATH = Path(DATA_DIR + "/patched/cmhc_alias_debug.json")
+
+def _dataclass_fields(obj):
+    # stdlib json hook: dataclasses encode as objects in field order, like orjson does natively
+    return {f.name: getattr(obj, f.name) for f in fields(obj)}
+
+def dumpb_indent(obj) -> bytes:
+    # same bytes as json.dumps(obj, indent=2, ensure_ascii=False) for JSON-native data
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, indent=2, ensure_ascii=False, default=_dataclass_fields).encode("utf-8")
+
+def write_all(p: Path, data: bytes):
+    # One os.write of the prebuilt buffer (looping only on a short write), skipping the
+    # buffered file object that Path.write_bytes sets up.
+    fd = os.open(p, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
 
 def zone_map(data):
-    return {r["name"]: r for r in data.get("neighbourhoods", []) if isinstance(r.get("name"), str)}
-
-tor_z = zone_map(tor)
-van_z = zone_map(van)
-mtl_z = zone_map(mtl)
-
-# Show a quick sample of zone names for Vancouver / Montreal to guide mapping
-van_names = sorted(list(van_z.keys()))[:40]
-mtl_names = sorted(list(mtl_z.keys()))[:40]
+    # Only the zone names and their 1-bed values are read downstream, so keep those as
+    # parallel lists plus a name -> position index instead of a dict of full records.
+    # A repeated name keeps its first position and its last record's value.
+    names, onebed, index = [], [], {}
+    for r in data.get("neighbourhoods", ()):
+        name = r.get("name")
+        if type(name) is not str:  # parsed JSON never yields str subclasses
+            continue
+        val = r.get("1bed")
+        v = float(val) if isinstance(val, (int, float)) else None
+        i = index.get(name)
+        if i is None:
+            index[name] = len(names)
+            names.append(name)
+            onebed.append(v)
+        else:
+            onebed[i] = v
+    return names, onebed, index
+
+ZONE_MAP_LAYOUT = "names/onebed/index"  # bump when zone_map()'s return shape changes
+
+def load_zone_map(p: Path):
+    # memoized on disk across runs and shared with merge_cmhc (see _cmhc_cache)
+    return _cmhc_cache.load(p, zone_map, tag="zmap:" + ZONE_MAP_LAYOUT)
+
+# independent files: overlap the three reads instead of doing them back to back
+with ThreadPoolExecutor(max_workers=3) as ex:
+    tor_z, van_z, mtl_z = ex.map(load_zone_map, [TORONTO_PATH, VAN_PATH, MTL_PATH])
 
 # --- Friendly -> CMHC mappings (best-effort) ---
 
@@ -45,45 +95,68 @@ tor_mapping = {
 # Try to locate suitable Vancouver / Montreal zone names heuristically:
 # We'll search keys containing certain substrings; fall back to roll-ups if present.
 
-def find_zone_like(zmap, *candidates):
-    # Return the first zone containing any candidate substring (case-insensitive)
-    keys = list(zmap.keys())
+def build_zone_hits(names, patterns):
+    # Single pass over the zone names for all candidate substrings of a city: one
+    # alternation regex (longest first, inside a lookahead so overlapping hits are all
+    # reported) scans each lowercased key once. Patterns that are a prefix of the one
+    # matched at a position are credited too, since the alternation only reports one.
+    # `patterns` are lowercase; returns {pattern: first zone in map order containing it}.
+    pats = sorted(set(patterns), key=len, reverse=True)
+    also = {p: [q for q in pats if p.startswith(q)] for p in pats}
+    rx = re.compile("(?=(" + "|".join(re.escape(p) for p in pats) + "))")
+    hits = {}
+    for k in names:
+        for m in rx.finditer(k.lower()):
+            for q in also[m.group(1)]:
+                hits.setdefault(q, k)
+        if len(hits) == len(pats):
+            break
+    return hits
+
+def find_zone_like(hits, candidates):
+    # First candidate (in priority order) that occurs in any zone; `hits` is from build_zone_hits()
+    # and `candidates` is a tuple of lowercase substrings.
     for cand in candidates:
-        c = cand.lower()
-        for k in keys:
-            if c in k.lower():
-                return k
+        k = hits.get(cand)
+        if k is not None:
+            return k
     return None
 
+def resolve_mapping(zones, candidates_by_friendly):
+    hits = build_zone_hits(zones[0], [c for cands in candidates_by_friendly.values() for c in cands])
+    return {friendly: find_zone_like(hits, cands) for friendly, cands in candidates_by_friendly.items()}
+
 # Vancouver friendly names from user's original JSON
 # We'll match to likely CMHC roll-ups or specific zones if they exist.
-van_mapping = {}
-van_mapping["Downtown"] = find_zone_like(van_z, "Downtown", "City of Vancouver (Downtown)") or \
-                           find_zone_like(van_z, "Vancouver (West Side)")  # fallback
-van_mapping["Kitsilano"] = find_zone_like(van_z, "Kitsilano", "Vancouver (West Side)")
-van_mapping["Mount Pleasant"] = find_zone_like(van_z, "Mount Pleasant", "Vancouver (East Side)")
-van_mapping["East Vancouver"] = find_zone_like(van_z, "Vancouver (East Side)", "Hastings", "Renfrew")
-van_mapping["Burnaby Metrotown"] = find_zone_like(van_z, "Metrotown", "Burnaby")
-van_mapping["Richmond City Centre"] = find_zone_like(van_z, "Richmond City Centre", "Richmond")
+# candidate substrings are lowercase already; they are matched against lowercased zone names
+van_candidates = {
+    "Downtown": ("downtown", "city of vancouver (downtown)", "vancouver (west side)"),  # last is the fallback
+    "Kitsilano": ("kitsilano", "vancouver (west side)"),
+    "Mount Pleasant": ("mount pleasant", "vancouver (east side)"),
+    "East Vancouver": ("vancouver (east side)", "hastings", "renfrew"),
+    "Burnaby Metrotown": ("metrotown", "burnaby"),
+    "Richmond City Centre": ("richmond city centre", "richmond"),
+}
+van_mapping = resolve_mapping(van_z, van_candidates)
 
 # Montreal friendly names from user's original JSON
-mtl_mapping = {}
-mtl_mapping["Ville-Marie (Downtown)"] = find_zone_like(mtl_z, "Ville-Marie", "Downtown", "Centre-ville", "Montreal (Centre)")
-mtl_mapping["Griffintown"] = find_zone_like(mtl_z, "Griffintown", "Sud-Ouest", "Le Sud-Ouest")
-mtl_mapping["Plateau-Mont-Royal"] = find_zone_like(mtl_z, "Plateau-Mont-Royal", "Plateau")
-mtl_mapping["Outremont"] = find_zone_like(mtl_z, "Outremont")
-mtl_mapping["Rosemont–La Petite-Patrie"] = find_zone_like(mtl_z, "Rosemont", "La Petite-Patrie")
-mtl_mapping["Verdun"] = find_zone_like(mtl_z, "Verdun")
+mtl_candidates = {
+    "Ville-Marie (Downtown)": ("ville-marie", "downtown", "centre-ville", "montreal (centre)"),
+    "Griffintown": ("griffintown", "sud-ouest", "le sud-ouest"),
+    "Plateau-Mont-Royal": ("plateau-mont-royal", "plateau"),
+    "Outremont": ("outremont",),
+    "Rosemont–La Petite-Patrie": ("rosemont", "la petite-patrie"),
+    "Verdun": ("verdun",),
+}
+mtl_mapping = resolve_mapping(mtl_z, mtl_candidates)
 
 # Collect the chosen zones with their 1bed values (may be None if not found)
-def extract_pairs(zmap, mapping):
+def extract_pairs(zones, mapping):
+    _, onebed, index = zones
     out = {}
     for friendly, zone in mapping.items():
-        v = None
-        if zone and zone in zmap:
-            val = zmap[zone].get("1bed")
-            v = float(val) if isinstance(val, (int, float)) else None
-        out[friendly] = {"cmhc_zone": zone, "cmhc_1bed": v}
+        i = index.get(zone) if zone else None
+        out[friendly] = {"cmhc_zone": zone, "cmhc_1bed": onebed[i] if i is not None else None}
     return out
 
 tor_pairs = extract_pairs(tor_z, tor_mapping)
@@ -92,6 +165,59 @@ mtl_pairs = extract_pairs(mtl_z, mtl_mapping)
 
 # Build a patched neighbourhood_medians.json using the user's original schema and friendly names,
 # but alias to CMHC zones and inject CMHC 1bed values.
+# Seed values per city: (friendly name, transit, distance_km); CMHC fields come from PAIRS.
+NBHDS = {
+    "Toronto": [
+        ("Downtown Core", 95, 0.5),
+        ("Liberty Village", 90, 2.5),
+        ("Midtown (Yonge–Eglinton)", 88, 6.1),
+        ("Etobicoke", 72, 9.8),
+        ("North York", 80, 11.5),
+        ("Scarborough", 70, 13.1),
+    ],
+    "Vancouver": [
+        ("Downtown", 96, 0.5),
+        ("Kitsilano", 83, 4.0),
+        ("Mount Pleasant", 85, 3.0),
+        ("East Vancouver", 80, 5.5),
+        ("Burnaby Metrotown", 82, 9.0),
+        ("Richmond City Centre", 78, 12.0),
+    ],
+    "Montreal": [
+        ("Ville-Marie (Downtown)", 95, 0.7),
+        ("Griffintown", 90, 1.5),
+        ("Plateau-Mont-Royal", 88, 2.0),
+        ("Outremont", 86, 4.5),
+        ("Rosemont–La Petite-Patrie", 83, 4.0),
+        ("Verdun", 80, 6.0),
+    ],
+}
+
+PAIRS = {"Toronto": tor_pairs, "Vancouver": van_pairs, "Montreal": mtl_pairs}
+MEDIANS = {
+    "Toronto": {"studio": 2000, "1bed": 2500, "2bed": 3200},
+    "Vancouver": {"studio": 2100, "1bed": 2550, "2bed": 3300},
+    "Montreal": {"studio": 1600, "1bed": 1900, "2bed": 2400},
+}
+
+@dataclass(slots=True)
+class Neighbourhood:
+    # one patched entry; serialized field by field in this order
+    name: str
+    alias_of: Optional[str]
+    median: Dict[str, Optional[float]]
+    transit: int
+    distance_km: float
+    source: str = "cmhc_alias"
+
+def build_neighbourhoods(city):
+    out = []
+    pairs = PAIRS[city]
+    for name, transit, dist in NBHDS[city]:
+        pair = pairs[name]
+        out.append(Neighbourhood(name, pair["cmhc_zone"], {"1bed": pair["cmhc_1bed"]}, transit, dist))
+    return out
+
 project = {
     "meta": {
         "version": "static_json_v1",
@@ -101,58 +227,25 @@ project = {
         "note": "Friendly names aliased to CMHC zones; 1-bed = CMHC Oct-24 average; transit/distance kept from seed where present."
     },
     "cities": {
-        "Toronto": {
-            "medians": {"studio": 2000, "1bed": 2500, "2bed": 3200},
-            "neighbourhoods": [
-                {"name": "Downtown Core", "alias_of": tor_pairs["Downtown Core"]["cmhc_zone"], "median": {"1bed": tor_pairs["Downtown Core"]["cmhc_1bed"]}, "transit": 95, "distance_km": 0.5, "source": "cmhc_alias"},
-                {"name": "Liberty Village", "alias_of": tor_pairs["Liberty Village"]["cmhc_zone"], "median": {"1bed": tor_pairs["Liberty Village"]["cmhc_1bed"]}, "transit": 90, "distance_km": 2.5, "source": "cmhc_alias"},
-                {"name": "Midtown (Yonge–Eglinton)", "alias_of": tor_pairs["Midtown (Yonge–Eglinton)"]["cmhc_zone"], "median": {"1bed": tor_pairs["Midtown (Yonge–Eglinton)"]["cmhc_1bed"]}, "transit": 88, "distance_km": 6.1, "source": "cmhc_alias"},
-                {"name": "Etobicoke", "alias_of": tor_pairs["Etobicoke"]["cmhc_zone"], "median": {"1bed": tor_pairs["Etobicoke"]["cmhc_1bed"]}, "transit": 72, "distance_km": 9.8, "source": "cmhc_alias"},
-                {"name": "North York", "alias_of": tor_pairs["North York"]["cmhc_zone"], "median": {"1bed": tor_pairs["North York"]["cmhc_1bed"]}, "transit": 80, "distance_km": 11.5, "source": "cmhc_alias"},
-                {"name": "Scarborough", "alias_of": tor_pairs["Scarborough"]["cmhc_zone"], "median": {"1bed": tor_pairs["Scarborough"]["cmhc_1bed"]}, "transit": 70, "distance_km": 13.1, "source": "cmhc_alias"},
-            ]
-        },
-        "Vancouver": {
-            "medians": {"studio": 2100, "1bed": 2550, "2bed": 3300},
-            "neighbourhoods": [
-                {"name": "Downtown", "alias_of": van_pairs["Downtown"]["cmhc_zone"], "median": {"1bed": van_pairs["Downtown"]["cmhc_1bed"]}, "transit": 96, "distance_km": 0.5, "source": "cmhc_alias"},
-                {"name": "Kitsilano", "alias_of": van_pairs["Kitsilano"]["cmhc_zone"], "median": {"1bed": van_pairs["Kitsilano"]["cmhc_1bed"]}, "transit": 83, "distance_km": 4.0, "source": "cmhc_alias"},
-                {"name": "Mount Pleasant", "alias_of": van_pairs["Mount Pleasant"]["cmhc_zone"], "median": {"1bed": van_pairs["Mount Pleasant"]["cmhc_1bed"]}, "transit": 85, "distance_km": 3.0, "source": "cmhc_alias"},
-                {"name": "East Vancouver", "alias_of": van_pairs["East Vancouver"]["cmhc_zone"], "median": {"1bed": van_pairs["East Vancouver"]["cmhc_1bed"]}, "transit": 80, "distance_km": 5.5, "source": "cmhc_alias"},
-                {"name": "Burnaby Metrotown", "alias_of": van_pairs["Burnaby Metrotown"]["cmhc_zone"], "median": {"1bed": van_pairs["Burnaby Metrotown"]["cmhc_1bed"]}, "transit": 82, "distance_km": 9.0, "source": "cmhc_alias"},
-                {"name": "Richmond City Centre", "alias_of": van_pairs["Richmond City Centre"]["cmhc_zone"], "median": {"1bed": van_pairs["Richmond City Centre"]["cmhc_1bed"]}, "transit": 78, "distance_km": 12.0, "source": "cmhc_alias"},
-            ]
-        },
-        "Montreal": {
-            "medians": {"studio": 1600, "1bed": 1900, "2bed": 2400},
-            "neighbourhoods": [
-                {"name": "Ville-Marie (Downtown)", "alias_of": mtl_pairs["Ville-Marie (Downtown)"]["cmhc_zone"], "median": {"1bed": mtl_pairs["Ville-Marie (Downtown)"]["cmhc_1bed"]}, "transit": 95, "distance_km": 0.7, "source": "cmhc_alias"},
-                {"name": "Griffintown", "alias_of": mtl_pairs["Griffintown"]["cmhc_zone"], "median": {"1bed": mtl_pairs["Griffintown"]["cmhc_1bed"]}, "transit": 90, "distance_km": 1.5, "source": "cmhc_alias"},
-                {"name": "Plateau-Mont-Royal", "alias_of": mtl_pairs["Plateau-Mont-Royal"]["cmhc_zone"], "median": {"1bed": mtl_pairs["Plateau-Mont-Royal"]["cmhc_1bed"]}, "transit": 88, "distance_km": 2.0, "source": "cmhc_alias"},
-                {"name": "Outremont", "alias_of": mtl_pairs["Outremont"]["cmhc_zone"], "median": {"1bed": mtl_pairs["Outremont"]["cmhc_1bed"]}, "transit": 86, "distance_km": 4.5, "source": "cmhc_alias"},
-                {"name": "Rosemont–La Petite-Patrie", "alias_of": mtl_pairs["Rosemont–La Petite-Patrie"]["cmhc_zone"], "median": {"1bed": mtl_pairs["Rosemont–La Petite-Patrie"]["cmhc_1bed"]}, "transit": 83, "distance_km": 4.0, "source": "cmhc_alias"},
-                {"name": "Verdun", "alias_of": mtl_pairs["Verdun"]["cmhc_zone"], "median": {"1bed": mtl_pairs["Verdun"]["cmhc_1bed"]}, "transit": 80, "distance_km": 6.0, "source": "cmhc_alias"},
-            ]
-        },
+        city: {"medians": MEDIANS[city], "neighbourhoods": build_neighbourhoods(city)}
+        for city in NBHDS
     }
 }
 
 # Write patched snapshot and also a per-city debug mapping for transparency
-out_dir = base / "patched"
-out_dir.mkdir(parents=True, exist_ok=True)
+OUT_DIR.mkdir(parents=True, exist_ok=True)
 
-patched_path = out_dir / "neighbourhood_medians_patched.json"
-patched_path.write_text(json.dumps(project, indent=2, ensure_ascii=False))
+write_all(PATCHED_PATH, dumpb_indent(project))
 
 mappings_debug = {
     "Toronto": tor_pairs,
     "Vancouver": van_pairs,
     "Montreal": mtl_pairs,
-    "Vancouver_zone_names_sample": sorted(list(van_z.keys()))[:60],
-    "Montreal_zone_names_sample": sorted(list(mtl_z.keys()))[:60],
+    # first 60 zone names alphabetically, to guide aliasing (partial sort, not a full one)
+    "Vancouver_zone_names_sample": heapq.nsmallest(60, van_z[0]),
+    "Montreal_zone_names_sample": heapq.nsmallest(60, mtl_z[0]),
 }
-map_path = out_dir / "cmhc_alias_debug.json"
-map_path.write_text(json.dumps(mappings_debug, indent=2, ensure_ascii=False))
+write_all(MAP_PATH, dumpb_indent(mappings_debug))
 
-print("Wrote:", str(patched_path))
-print("Wrote:", str(map_path))
+print("Wrote:", str(PATCHED_PATH))
+print("Wrote:", str(MAP_PATH))
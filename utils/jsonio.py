@@ -0,0 +1,45 @@
+# utils/jsonio.py
+# JSON encode/decode shared by the Lambda handlers, orchestrator and ledger.
+# Uses orjson when installed (C/SIMD parser, emits UTF-8 bytes directly) and falls back to
+# the stdlib json module with the same output shape: compact separators, non-ASCII kept.
+
+import json
+from typing import Any, Dict, Union
+
+try:
+    import orjson  # type: ignore
+except Exception:
+    orjson = None  # stdlib fallback keeps local usage dependency-free
+
+_ORJSON_OPTS = orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+def dumpb(obj: Any) -> bytes:
+    """Serialize to UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=_ORJSON_OPTS)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def dumps(obj: Any) -> str:
+    """Serialize to a JSON str (API Gateway bodies, Bedrock payloads)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=_ORJSON_OPTS).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+    """Parse JSON from str or UTF-8 bytes-like input."""
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+def dumps_with_raw(obj: Dict[str, Any], raw: Dict[str, str]) -> str:
+    """
+    Serialize a dict, splicing already-serialized JSON values for the keys in `raw`
+    (emitted after the regular keys) instead of re-encoding those objects.
+    """
+    head = dumps({k: v for k, v in obj.items() if k not in raw})
+    if not raw:
+        return head
+    tail = ",".join(f"{dumps(k)}:{v}" for k, v in raw.items())
+    return head[:-1] + ("," if len(head) > 2 else "") + tail + "}"